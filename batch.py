@@ -0,0 +1,677 @@
+"""Пакетная генерация оценочных листов без Tk.
+
+    python -m batch "ДЗ_3" --selections grades.json [--roster student_list.csv] [--jobs 0]
+        [--archive created_files/ДЗ_3.zip] [--trace trace.jsonl]
+
+Листы сохраняются в created_files/<домашняя работа>/ так же, как кнопкой
+«Сформировать и сохранить оценочный лист», или потоком в один ZIP/TAR. Файл выбора — JSON-список
+объектов или CSV; формат описан в README (раздел «Пакетная генерация»).
+Номера вариантов, подпунктов, штрафов и поощрений в файле считаются с 1,
+как в интерфейсе; вместо номера можно указать текст пункта.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+from concurrent.futures.process import BrokenProcessPool
+
+from criteria import CRITERIA_FILENAME, load_criteria
+from gradebook import GRADEBOOK_FILENAME, Gradebook
+from output import (
+    DEFAULT_FORMAT,
+    DEFAULT_PNG_LEVEL,
+    OUTPUT_FORMATS,
+    SUB_PATH,
+    SheetArchive,
+    check_format,
+    encode_sheet,
+    is_archive_path,
+    save_sheet,
+    sheet_path,
+)
+from render_cache import RenderIndex, render_key
+from rendering import layout_report, sheet_template, warm_caches
+from roster import STUDENT_LIST_FILENAME, RosterIndex, read_student_list, resolve_variant
+from scoring import ScoringError, compute_report, format_score
+import tracing
+
+# Столбцы CSV-файла выбора (кроме столбцов с заголовками разделов)
+CSV_COLUMNS = {
+    "ФИО": "student",
+    "Группа": "group",
+    "Вариант": "variant",
+    "Сдано вовремя": "on_time",
+    "Дней просрочки": "delay",
+    "Комментарий": "comment",
+    "Штрафы": "penalties",
+    "Поощрения": "rewards",
+    "Двойной режим": "double_mode",
+    "Вариант на 8": "limit_to_eight",
+}
+
+
+class SelectionError(ScoringError):
+    """Ошибка в файле выбора для конкретного студента."""
+
+
+def _parse_bool(value, default):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else "").strip().lower()
+    if not text:
+        return default
+    return text in ("1", "да", "true", "yes", "y", "+")
+
+
+def _split_numbers(text):
+    return [part.strip() for part in text.split(",") if part.strip()]
+
+
+def _parse_csv_section(value):
+    """'2' или '2:1,3' — вариант и подпункты; '1,3' — отмеченные чекбоксы; '-' — ничего."""
+    value = value.strip()
+    if not value:
+        return None
+    if value == "-":
+        return {"option": None, "suboptions": [], "checked": []}
+    option, _, suboptions = value.partition(":")
+    numbers = _split_numbers(option)
+    return {
+        "option": numbers[0] if len(numbers) == 1 else None,
+        "suboptions": _split_numbers(suboptions),
+        "checked": numbers,
+    }
+
+
+def load_selections(path):
+    """Читает файл выбора (JSON или CSV) и возвращает список «сырых» записей."""
+    if path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as csvfile:
+            sample = csvfile.read(4096)
+            csvfile.seek(0)
+            try:
+                delimiter = csv.Sniffer().sniff(sample, delimiters=";,").delimiter
+            except csv.Error:
+                delimiter = ";"
+            entries = []
+            for row in csv.DictReader(csvfile, delimiter=delimiter):
+                entry = {"sections": {}}
+                for column, value in row.items():
+                    if column is None:
+                        continue
+                    column = column.strip()
+                    value = (value or "").strip()
+                    key = CSV_COLUMNS.get(column)
+                    if key in ("penalties", "rewards"):
+                        entry[key] = _split_numbers(value)
+                    elif key is not None:
+                        if value:
+                            entry[key] = value
+                    else:
+                        section_state = _parse_csv_section(value)
+                        if section_state is not None:
+                            entry["sections"][column] = section_state
+                entries.append(entry)
+            return entries
+
+    with open(path, encoding="utf-8-sig") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("students", [])
+    return data
+
+
+def _resolve_item(value, texts, what):
+    """Номер (с 1) или текст пункта -> индекс с 0."""
+    if isinstance(value, str) and not value.strip().isdigit():
+        text = value.strip()
+        for index, candidate in enumerate(texts):
+            if candidate.strip() == text:
+                return index
+        raise SelectionError(f"{what}: пункт «{text}» не найден.")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        # Дробные номера не округляются: 1.5 — скорее опечатка, чем пункт 1
+        raise SelectionError(f"{what}: номер пункта должен быть целым числом или текстом, а не {value!r}.")
+    number = int(value)
+    if not 1 <= number <= len(texts):
+        raise SelectionError(f"{what}: номер {number} вне диапазона 1–{len(texts)}.")
+    return number - 1
+
+
+def _item_list(value, what):
+    """Список номеров или текстов пунктов; None — пустой список."""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise SelectionError(f"{what}: ожидается список пунктов, а не {value!r}.")
+    return value
+
+
+def _normalize_section(section, raw_state):
+    title = section.get("title", "")
+    options = section.get("options", [])
+    if not isinstance(raw_state, dict):
+        # Краткая запись: номер варианта или список отмеченных чекбоксов
+        values = raw_state if isinstance(raw_state, list) else [raw_state]
+        raw_state = {"option": raw_state, "checked": values}
+    if section.get("type") == "radio_with_subchecks":
+        if "score" in raw_state:
+            try:
+                if isinstance(raw_state["score"], bool):
+                    raise TypeError
+                score = float(raw_state["score"])
+            except (TypeError, ValueError):
+                raise SelectionError(
+                    f"{title}: балл должен быть числом, а не {raw_state['score']!r}."
+                ) from None
+            option_index = next(
+                (
+                    index
+                    for index, option in enumerate(options)
+                    if abs(float(option.get("score", 0.0)) - score) < 1e-9
+                ),
+                None,
+            )
+        elif raw_state.get("option") is not None:
+            option_index = _resolve_item(
+                raw_state["option"], [o.get("text", "") for o in options], title
+            )
+            score = float(options[option_index].get("score", 0.0))
+        else:
+            # Ни один вариант не выбран — как после «Очистить все поля»
+            return {"score": 0.0, "suboptions": []}
+        suboptions = []
+        if option_index is not None:
+            subtexts = options[option_index].get("suboptions", [])
+            suboptions = [
+                [option_index, _resolve_item(value, subtexts, title)]
+                for value in _item_list(raw_state.get("suboptions"), title)
+            ]
+        return {"score": score, "suboptions": suboptions}
+
+    if section.get("type") == "checkbox":
+        texts = [o.get("text", "") for o in options]
+        return {
+            "checked": sorted(
+                {
+                    _resolve_item(value, texts, title)
+                    for value in _item_list(raw_state.get("checked"), title)
+                }
+            )
+        }
+    return {}
+
+
+def normalize_selection(raw, homework, criteria, roster_index, variant_count):
+    """Приводит запись из файла выбора к формату scoring.compute_report.
+
+    Любая ошибка в записи (не тот тип, неизвестный пункт, номер вне
+    диапазона) — SelectionError с понятным текстом.
+    """
+    if not isinstance(raw, dict):
+        raise SelectionError(f"Запись должна быть объектом с полями студента, а не {raw!r}.")
+    student = str(raw.get("student") or raw.get("ФИО") or "").strip()
+    group = str(raw.get("group") or raw.get("Группа") or "").strip()
+    if not student or not group:
+        raise SelectionError("Не указаны ФИО и группа студента.")
+
+    limit_to_eight = _parse_bool(raw.get("limit_to_eight"), True)
+    double_mode = _parse_bool(raw.get("double_mode"), False)
+    if not double_mode:
+        # В GUI без двойного режима флажок «вариант на 8» всегда установлен
+        limit_to_eight = True
+    sections = criteria.homeworks[homework].section_dicts(limit_to_eight)
+
+    variant = str(raw.get("variant") or "").strip()
+    if not variant:
+        position = roster_index.position(group, student)
+        if position is None:
+            raise SelectionError(
+                f"Студент «{student}» ({group}) не найден в списке и вариант не указан."
+            )
+        record = roster_index.record(group, student)
+        variant = resolve_variant(record, position + 1, variant_count)
+
+    raw_sections = raw.get("sections") or {}
+    if not isinstance(raw_sections, dict):
+        raise SelectionError("Поле sections должно быть объектом «раздел: выбор».")
+    known_titles = {section.get("title", "") for section in sections}
+    unknown = [title for title in raw_sections if title not in known_titles]
+    if unknown:
+        raise SelectionError(f"Неизвестные разделы критериев: {', '.join(unknown)}.")
+    section_states = {
+        section.get("title", ""): _normalize_section(
+            section, raw_sections[section.get("title", "")]
+        )
+        for section in sections
+        if section.get("title", "") in raw_sections
+    }
+
+    penalty_texts = [penalty.text for penalty in criteria.penalties]
+    reward_texts = [reward.text for reward in criteria.rewards]
+    delay = raw.get("delay", raw.get("delay_days", 0))
+    return {
+        "homework": homework,
+        "student": student,
+        "group": group,
+        "variant": variant,
+        "on_time": _parse_bool(raw.get("on_time"), True),
+        "delay": str(delay if delay is not None else ""),
+        "comment": str(raw.get("comment") or "").strip(),
+        "double_mode": double_mode,
+        "limit_to_eight": limit_to_eight,
+        "sections": section_states,
+        "penalties": sorted(
+            {
+                _resolve_item(v, penalty_texts, "Штрафы")
+                for v in _item_list(raw.get("penalties"), "Штрафы")
+            }
+        ),
+        "rewards": sorted(
+            {
+                _resolve_item(v, reward_texts, "Поощрения")
+                for v in _item_list(raw.get("rewards"), "Поощрения")
+            }
+        ),
+    }
+
+
+def build_roster_index(records):
+    """roster.RosterIndex для поиска записи и позиции студента в группе."""
+    return RosterIndex(records)
+
+
+def score_selection(selection, criteria):
+    homework = criteria.homeworks[selection["homework"]]
+    with tracing.span("scoring"):
+        return compute_report(
+            homework.section_dicts(selection.get("limit_to_eight", True)),
+            selection,
+            criteria.data.get("penalties", []),
+            criteria.data.get("rewards", []),
+        )
+
+
+def homework_template(criteria, homework):
+    """Шаблон неизменных строк листа (rendering.SheetTemplate) для домашней работы."""
+    return sheet_template(
+        criteria.homeworks[homework].section_dicts(False),
+        criteria.data.get("penalties", []),
+        criteria.data.get("rewards", []),
+    )
+
+
+def draw_selection(selection, criteria, template=None):
+    """Считает и рисует лист одного студента; возвращает (изображение, отчёт)."""
+    report = score_selection(selection, criteria)
+    with tracing.span("layout"):
+        layout = layout_report(report)
+    with tracing.span("draw"):
+        image = layout.draw(template=template)
+    return image, report
+
+
+def render_selection(selection, criteria, output_dir=SUB_PATH, template=None,
+                     fmt=DEFAULT_FORMAT, compress_level=DEFAULT_PNG_LEVEL):
+    """Считает, рисует и сохраняет лист одного студента; возвращает (путь, отчёт)."""
+    image, report = draw_selection(selection, criteria, template)
+    filename = sheet_path(selection["homework"], selection["student"], output_dir, fmt)
+    save_sheet(image, filename, fmt, compress_level)
+    return filename, report
+
+
+def _render_task(selection, criteria, output_dir, template=None,
+                 fmt=DEFAULT_FORMAT, compress_level=DEFAULT_PNG_LEVEL):
+    """Рендер одного студента с изоляцией ошибок: ("ok", путь, отчёт) или ("error", текст).
+
+    При output_dir=None лист не сохраняется, а возвращается закодированным
+    вместо пути — для записи в архив.
+    """
+    try:
+        with tracing.span("sheet", homework=selection["homework"], student=selection["student"]):
+            if output_dir is None:
+                image, report = draw_selection(selection, criteria, template)
+                result = encode_sheet(image, fmt, compress_level)
+            else:
+                result, report = render_selection(
+                    selection, criteria, output_dir, template, fmt, compress_level
+                )
+    except Exception as e:
+        return ("error", str(e) or type(e).__name__)
+    return ("ok", result, report)
+
+
+# Состояние рабочего процесса пула (задаётся в _init_worker)
+_worker_criteria = None
+_worker_output_dir = SUB_PATH
+_worker_template = None
+_worker_encoding = (DEFAULT_FORMAT, DEFAULT_PNG_LEVEL)
+
+
+def _init_worker(criteria, output_dir, homework, encoding):
+    global _worker_criteria, _worker_output_dir, _worker_template, _worker_encoding
+    _worker_criteria = criteria
+    _worker_output_dir = output_dir
+    _worker_encoding = encoding
+    # Кэши шрифтов, эмодзи и шаблон листа создаются один раз на процесс
+    warm_caches(reward.text for reward in criteria.rewards)
+    _worker_template = homework_template(criteria, homework)
+
+
+def _worker_render(selection):
+    return _render_task(
+        selection, _worker_criteria, _worker_output_dir, _worker_template, *_worker_encoding
+    )
+
+
+def _prepare_entries(homework, raw_entries, criteria, roster_index, variant_count,
+                     output_dir, fmt, compress_level, index, force, gradebook):
+    """Разбирает записи по одной: (запись, выбор или None, пропуск или ошибка, ключ).
+
+    Для листа, который не нужно перерисовывать, вместо выбора None, а третьим
+    элементом — пара (путь, отчёт).
+    """
+    rubric_version = criteria.homeworks[homework].version
+    for raw in raw_entries:
+        try:
+            selection = normalize_selection(
+                raw, homework, criteria, roster_index, variant_count
+            )
+        except (ScoringError, ValueError) as e:
+            yield raw, None, str(e), None
+            continue
+        key = None
+        if index is not None:
+            key = render_key(selection, rubric_version, fmt, compress_level)
+            filename = sheet_path(homework, selection["student"], output_dir, fmt)
+            if not force and index.is_current(filename, key):
+                # Лист не изменился: нужен только отчёт для журнала
+                report = score_selection(selection, criteria)
+                if gradebook is not None:
+                    gradebook.upsert(selection, report, rubric_version, commit=False)
+                yield raw, None, (filename, report), None
+                continue
+        yield raw, selection, None, key
+
+
+class _WorkerPool:
+    """Пул процессов пакета, переживающий аварийное завершение рабочего процесса.
+
+    Если процесс пула погиб (нехватка памяти, сбой в Pillow), все его
+    незавершённые задания получают BrokenProcessPool. Следующие задания идут в
+    новый пул, а каждое оборвавшееся повторяется в отдельном одноразовом
+    процессе — так ошибку получает только студент, на котором процесс падает.
+    """
+
+    def __init__(self, jobs, initargs):
+        self.jobs = jobs
+        self.initargs = initargs
+        self._executor = None
+
+    def _new_executor(self, workers):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=self.initargs
+        )
+
+    def submit(self, selection):
+        if self._executor is None:
+            self._executor = self._new_executor(self.jobs)
+        try:
+            future = self._executor.submit(_worker_render, selection)
+        except BrokenProcessPool:
+            # Пул упал, а его задания ещё не разобраны — они повторятся в result()
+            self._executor.shutdown()
+            self._executor = self._new_executor(self.jobs)
+            future = self._executor.submit(_worker_render, selection)
+        return self._executor, future
+
+    def result(self, task, selection):
+        """Итог _worker_render для задания из submit(), даже если пул упал."""
+        executor, future = task
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            pass
+        if executor is self._executor:
+            self._executor = None
+        executor.shutdown()
+        alone = self._new_executor(1)
+        try:
+            return alone.submit(_worker_render, selection).result()
+        except BrokenProcessPool:
+            return ("error", "рабочий процесс аварийно завершился на этом листе")
+        finally:
+            alone.shutdown()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def _finish_entry(entry, outcome, index, gradebook, rubric_version):
+    """Результат iter_batch для одной записи; outcome — итог _render_task или None."""
+    raw, selection, skipped, key = entry
+    if selection is None:
+        if isinstance(skipped, tuple):
+            return raw, skipped[0], skipped[1], False
+        return raw, None, skipped, False
+    if outcome[0] != "ok":
+        return raw, None, outcome[1], False
+    if key is not None:
+        index.record(outcome[1], key)
+    if gradebook is not None:
+        gradebook.upsert(selection, outcome[2], rubric_version, commit=False)
+    return raw, outcome[1], outcome[2], True
+
+
+def iter_batch(homework, raw_entries, criteria, roster_records, variant_count=29,
+               output_dir=SUB_PATH, jobs=1, fmt=DEFAULT_FORMAT,
+               compress_level=DEFAULT_PNG_LEVEL, index=None, force=False,
+               gradebook=None):
+    """Генерирует листы и выдаёт результаты по мере готовности в порядке входного файла.
+
+    Каждый элемент — (запись, путь или None, отчёт или текст ошибки, нарисован
+    ли лист); при output_dir=None вместо пути выдаются байты закодированного
+    листа. Если передан index (render_cache.RenderIndex), листы, уже
+    сохранённые с тем же ключом, не рисуются заново (при force — рисуются
+    все), а новые записываются в индекс. Если передан gradebook
+    (gradebook.Gradebook), каждая посчитанная оценка записывается в него без
+    фиксации транзакции. Записи разбираются по мере обработки, а при
+    jobs > 1 студенты распределяются по пулу процессов, причём в работе
+    одновременно не больше jobs * 4 записей, так что сверх самого списка
+    записей память не растёт с размером пакета. Ошибка одного студента не
+    прерывает пакет.
+    """
+    roster_index = build_roster_index(roster_records)
+    if output_dir is None:
+        index = None
+    rubric_version = criteria.homeworks[homework].version
+    entries = _prepare_entries(
+        homework, raw_entries, criteria, roster_index, variant_count,
+        output_dir, fmt, compress_level, index, force, gradebook,
+    )
+    if isinstance(raw_entries, (list, tuple)):
+        jobs = min(jobs, len(raw_entries))
+    template = homework_template(criteria, homework) if jobs <= 1 else None
+    window = jobs * 4 if jobs > 1 else 1
+    # Пул запускается при первом листе, который действительно нужно нарисовать
+    pool = None
+    if jobs > 1:
+        pool = _WorkerPool(jobs, (criteria, output_dir, homework, (fmt, compress_level)))
+    pending = collections.deque()
+
+    def finish():
+        entry, task = pending.popleft()
+        selection = entry[1]
+        outcome = None
+        if task is not None:
+            outcome = pool.result(task, selection)
+        elif selection is not None:
+            outcome = _render_task(selection, criteria, output_dir, template, fmt, compress_level)
+        return _finish_entry(entry, outcome, index, gradebook, rubric_version)
+
+    try:
+        for entry in entries:
+            task = pool.submit(entry[1]) if pool is not None and entry[1] is not None else None
+            pending.append((entry, task))
+            if len(pending) >= window:
+                yield finish()
+        while pending:
+            yield finish()
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+def run_batch(homework, raw_entries, criteria, roster_records, variant_count=29,
+              output_dir=SUB_PATH, jobs=1, log=print, fmt=DEFAULT_FORMAT,
+              compress_level=DEFAULT_PNG_LEVEL, archive_path=None, force=False,
+              gradebook_path=GRADEBOOK_FILENAME):
+    """Генерирует листы для всех записей и печатает ход работы.
+
+    Если задан archive_path (.zip, .tar, .tar.gz), листы пишутся потоком в
+    этот архив вместе с manifest.csv, а output_dir не используется. Иначе
+    листы, входные данные которых не изменились с прошлого запуска, не
+    перерисовываются, если не задан force (см. render_cache.py). Оценки
+    записываются в базу gradebook_path одной транзакцией (None — не записывать).
+    Возвращает список кортежей (запись, путь или None, итоговая оценка или
+    текст ошибки) — отчёты целиком не накапливаются; для архива путь имеет
+    вид «архив:имя внутри архива».
+    """
+    archive = SheetArchive(archive_path) if archive_path else None
+    index = RenderIndex(output_dir) if archive is None else None
+    gradebook = Gradebook(gradebook_path) if gradebook_path else None
+    try:
+        return _run_batch(
+            homework, raw_entries, criteria, roster_records, variant_count,
+            None if archive else output_dir, jobs, log, fmt, compress_level, archive, index, force,
+            gradebook,
+        )
+    finally:
+        if archive is not None:
+            archive.close()
+        if index is not None:
+            index.save()
+        if gradebook is not None:
+            gradebook.commit()
+            gradebook.close()
+
+
+def _run_batch(homework, raw_entries, criteria, roster_records, variant_count,
+               output_dir, jobs, log, fmt, compress_level, archive, index, force,
+               gradebook):
+    results = []
+    for raw, filename, outcome, rendered in iter_batch(
+        homework, raw_entries, criteria, roster_records,
+        variant_count=variant_count, output_dir=output_dir, jobs=jobs,
+        fmt=fmt, compress_level=compress_level, index=index, force=force,
+        gradebook=gradebook,
+    ):
+        if filename is not None and archive is not None:
+            member = archive.add_sheet(homework, outcome, filename, fmt)
+            filename = f"{archive.path}:{member}"
+        if filename is None:
+            name = (raw.get("student") or raw.get("ФИО") if isinstance(raw, dict) else None) or "?"
+            log(f"[ошибка] {name}: {outcome}")
+            results.append((raw, None, outcome))
+        else:
+            log(
+                f"{outcome['student']} ({outcome['group']}): "
+                f"{format_score(outcome['final_score'])} из {format_score(outcome['max_score_cap'])}"
+                f" -> {filename}{'' if rendered else ' (без изменений)'}"
+            )
+            results.append((raw, filename, outcome["final_score"]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m batch",
+        description="Пакетная генерация оценочных листов без графического интерфейса",
+    )
+    parser.add_argument("homework", help="название домашней работы из criteria.json")
+    parser.add_argument(
+        "--selections", required=True, help="JSON- или CSV-файл с выбором по студентам"
+    )
+    parser.add_argument("--roster", default=STUDENT_LIST_FILENAME, help="список студентов")
+    parser.add_argument("--criteria", default=CRITERIA_FILENAME, help="файл критериев")
+    parser.add_argument(
+        "--variant-count", type=int, default=29, help="количество вариантов (по умолчанию 29)"
+    )
+    parser.add_argument("--output-dir", default=SUB_PATH, help="корневая папка для листов")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="число рабочих процессов; 0 — по числу ядер (по умолчанию 1)",
+    )
+    parser.add_argument(
+        "--format", dest="fmt", choices=list(OUTPUT_FORMATS), default=DEFAULT_FORMAT,
+        help="формат файлов: png, png-palette или webp (по умолчанию png)",
+    )
+    parser.add_argument(
+        "--png-level", type=int, default=DEFAULT_PNG_LEVEL,
+        help=f"уровень сжатия PNG от 0 до 9 (по умолчанию {DEFAULT_PNG_LEVEL})",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="перерисовать все листы, даже если входные данные не изменились",
+    )
+    parser.add_argument(
+        "--gradebook", default=GRADEBOOK_FILENAME,
+        help=f"база оценок SQLite (по умолчанию {GRADEBOOK_FILENAME}); пустая строка — не записывать",
+    )
+    parser.add_argument(
+        "--archive",
+        help="записать все листы в один архив (.zip, .tar, .tar.gz) вместо отдельных файлов",
+    )
+    parser.add_argument(
+        "--trace", nargs="?", const=tracing.DEFAULT_TRACE_FILENAME, metavar="FILE",
+        help=f"записать время этапов каждого листа в JSONL (по умолчанию {tracing.DEFAULT_TRACE_FILENAME})",
+    )
+    args = parser.parse_args(argv)
+
+    criteria = load_criteria(args.criteria)
+    if args.homework not in criteria.homeworks:
+        parser.error(f"Критерии для '{args.homework}' не найдены.")
+    if args.variant_count <= 0:
+        parser.error("Количество вариантов должно быть целым положительным числом.")
+    try:
+        check_format(args.fmt, args.png_level)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.archive and not is_archive_path(args.archive):
+        parser.error("Архив должен иметь расширение .zip, .tar, .tar.gz или .tgz.")
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.trace:
+        # Рабочие процессы пула включают трассировку по переменной окружения
+        os.environ[tracing.TRACE_ENV] = args.trace
+        tracing.configure(args.trace)
+    roster_records = read_student_list(args.roster) if os.path.exists(args.roster) else []
+
+    results = run_batch(
+        args.homework,
+        load_selections(args.selections),
+        criteria,
+        roster_records,
+        variant_count=args.variant_count,
+        output_dir=args.output_dir,
+        jobs=jobs,
+        fmt=args.fmt,
+        compress_level=args.png_level,
+        archive_path=args.archive,
+        force=args.force,
+        gradebook_path=args.gradebook,
+    )
+    failed = sum(1 for _, filename, _ in results if filename is None)
+    print(f"Готово: {len(results) - failed} листов, ошибок: {failed}.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,473 @@
+"""Воспроизводимый бенчмарк формирования оценочных листов без графического интерфейса.
+
+    python benchmark.py [--sizes 30,1000,10000,100000] [--samples 20] [--sheets 40]
+        [--jobs 1] [--output benchmark_results.json]
+        [--baseline benchmark_baseline.json] [--threshold 0.15] [--save-baseline]
+
+Выбор студентов генерируется детерминированно (--seed) по criteria.json.
+Для каждой домашней работы, а у «Домашнее задание №1» и «ДЗ_2» — отдельно
+для режимов base (вариант на 8) и extended, в новом процессе измеряются:
+
+- холодный старт: от запуска процесса до первого готового листа (импорт,
+  разбор criteria.json без кэша, шаблон листа, шрифты и эмодзи);
+- задержка одного листа (расчёт, разметка, отрисовка, PNG) — p50/p90/p99;
+- пропускная способность пакета batch.iter_batch, листов в секунду;
+- пиковая память процесса (RSS) и объём готовых листов в байтах.
+
+Отдельно для списков студентов каждого размера из --sizes: чтение CSV,
+построение индекса групп и расчёт оценок всех студентов (без отрисовки —
+она от размера списка не зависит).
+
+Результаты пишутся в JSON. Если передан --baseline, каждая метрика
+сравнивается с сохранённой; ухудшение больше --threshold (доля) считается
+регрессией, и программа завершается с кодом 1.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+CRITERIA_PATH = os.path.join(BASE_PATH, "criteria.json")
+RESULTS_FILENAME = "benchmark_results.json"
+BASELINE_FILENAME = "benchmark_baseline.json"
+DEFAULT_SIZES = (30, 1000, 10000, 100000)
+DEFAULT_SEED = 2024
+DEFAULT_THRESHOLD = 0.15
+# Разница во времени меньше этой считается шумом, даже если в долях она велика
+NOISE_FLOOR_MS = 5.0
+GROUP_SIZE = 30
+
+# Метрика -> True, если чем больше, тем лучше
+CASE_METRICS = {
+    "cold_start_ms": False,
+    "latency_p50_ms": False,
+    "latency_p90_ms": False,
+    "latency_p99_ms": False,
+    "sheets_per_second": True,
+    "peak_rss_mb": False,
+    "mean_sheet_bytes": False,
+}
+ROSTER_METRICS = {
+    "load_ms": False,
+    "index_ms": False,
+    "scored_per_second": True,
+    "peak_rss_mb": False,
+}
+
+SURNAMES = (
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов",
+    "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев",
+)
+GIVEN_NAMES = (
+    "Александр", "Мария", "Дмитрий", "Анна", "Максим", "Екатерина", "Иван",
+    "Софья", "Артём", "Дарья", "Никита", "Полина",
+)
+COMMENTS = (
+    "Хорошая работа",
+    "Аккуратные линии, но проверьте масштаб 📏",
+    "Отлично! ✨\nОсновная надпись заполнена верно",
+    "Нужно доработать разрез ✏️",
+)
+
+
+def benchmark_cases(criteria):
+    """(название, домашняя работа, режим) для каждой работы; режим None, base или extended."""
+    cases = []
+    for name in criteria.homework_names:
+        if criteria.homeworks[name].has_extended:
+            cases.append((f"{name} [base]", name, "base"))
+            cases.append((f"{name} [extended]", name, "extended"))
+        else:
+            cases.append((name, name, None))
+    return cases
+
+
+def synthetic_roster(size, seed=DEFAULT_SEED):
+    """Список из size студентов (roster.StudentRecord) в группах по GROUP_SIZE.
+
+    У каждого третьего вариант не указан и вычисляется по номеру в группе.
+    """
+    from roster import StudentRecord
+
+    rng = random.Random(f"{seed}:roster")
+    records = []
+    for number in range(size):
+        fio = f"{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)} {number:06d}"
+        group = f"ИГ-{number // GROUP_SIZE + 101}"
+        variant = "" if number % 3 == 0 else str(rng.randint(1, 29))
+        records.append(StudentRecord(fio, group, variant))
+    return records
+
+
+def synthetic_selections(records, homework, criteria, mode=None, seed=DEFAULT_SEED):
+    """Записи выбора в формате файла batch.py для каждого студента из records."""
+    rng = random.Random(f"{seed}:{homework}:{mode}")
+    double_mode = mode == "extended"
+    sections = criteria.homeworks[homework].sections(not double_mode)
+    # Дисквалифицирующие штрафы обнуляют лист, на отрисовку это не похоже
+    penalties = [
+        number for number, penalty in enumerate(criteria.penalties, 1) if not penalty.disqualifying
+    ]
+    rewards = list(range(1, len(criteria.rewards) + 1))
+    for record in records:
+        raw_sections = {}
+        for section in sections:
+            if not section.options:
+                continue
+            # Чаще всего — максимальный балл, как у большинства работ
+            if rng.random() < 0.6 and section.max_option_index is not None:
+                option = section.max_option_index
+            else:
+                option = rng.randrange(len(section.options))
+            subtexts = section.options[option].suboptions
+            picked = min(len(subtexts), rng.randint(0, 2))
+            suboptions = sorted(rng.sample(range(1, len(subtexts) + 1), picked))
+            raw_sections[section.title] = {"option": option + 1, "suboptions": suboptions}
+        on_time = rng.random() < 0.85
+        yield {
+            "student": record["ФИО"],
+            "group": record["Группа"],
+            "sections": raw_sections,
+            "penalties": rng.sample(penalties, rng.randint(0, 2)) if rng.random() < 0.3 else [],
+            "rewards": rng.sample(rewards, rng.randint(1, 2)) if rewards and rng.random() < 0.4 else [],
+            "on_time": on_time,
+            "delay": 0 if on_time else rng.randint(1, 14),
+            "comment": rng.choice(COMMENTS) if rng.random() < 0.5 else "",
+            "double_mode": double_mode,
+            "limit_to_eight": not double_mode,
+        }
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not sorted_values:
+        return None
+    rank = min(max(1, math.ceil(fraction * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_mb(children=False):
+    """Пиковый RSS процесса (или его завершённых дочерних процессов) в МБ; None без resource."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: модуля resource нет
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux отдаёт килобайты, macOS — байты
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / divisor, 1)
+
+
+def run_case(homework, mode, samples, sheets, jobs, seed, launched_at, criteria_path=CRITERIA_PATH):
+    """Замеры одного случая; выполняется в отдельном процессе (см. _child)."""
+    started = time.perf_counter()
+    from batch import build_roster_index, draw_selection, homework_template, iter_batch, normalize_selection
+    from criteria import load_criteria
+    from output import encode_sheet
+    import PIL
+
+    imported = time.perf_counter()
+    criteria = load_criteria(criteria_path, use_cache=False)
+    loaded = time.perf_counter()
+
+    records = synthetic_roster(max(samples + 1, sheets), seed)
+    raw_entries = list(synthetic_selections(records, homework, criteria, mode, seed))
+    roster_index = build_roster_index(records)
+
+    def render(raw):
+        selection = normalize_selection(raw, homework, criteria, roster_index, 29)
+        image, _ = draw_selection(selection, criteria, template)
+        return encode_sheet(image)
+
+    first_started = time.perf_counter()
+    template = homework_template(criteria, homework)
+    render(raw_entries[0])
+    cold_start_ms = (time.time() - launched_at) * 1000
+    first_sheet_ms = (time.perf_counter() - first_started) * 1000
+
+    latencies = []
+    for raw in raw_entries[1:samples + 1]:
+        sheet_started = time.perf_counter()
+        render(raw)
+        latencies.append((time.perf_counter() - sheet_started) * 1000)
+    latencies.sort()
+
+    batch_started = time.perf_counter()
+    total_bytes = 0
+    produced = 0
+    errors = 0
+    for _, data, _, _ in iter_batch(
+        homework, raw_entries[:sheets], criteria, records, output_dir=None, jobs=jobs
+    ):
+        if data is None:
+            errors += 1
+        else:
+            produced += 1
+            total_bytes += len(data)
+    batch_seconds = time.perf_counter() - batch_started
+
+    return {
+        "homework": homework,
+        "mode": mode,
+        "pillow": PIL.__version__,
+        "cold_start_ms": round(cold_start_ms, 1),
+        "import_ms": round((imported - started) * 1000, 1),
+        "criteria_ms": round((loaded - imported) * 1000, 1),
+        "first_sheet_ms": round(first_sheet_ms, 1),
+        "latency_samples": len(latencies),
+        "latency_mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        "latency_p50_ms": _rounded(percentile(latencies, 0.50)),
+        "latency_p90_ms": _rounded(percentile(latencies, 0.90)),
+        "latency_p99_ms": _rounded(percentile(latencies, 0.99)),
+        "batch_sheets": produced,
+        "batch_errors": errors,
+        "batch_jobs": jobs,
+        "sheets_per_second": round(produced / batch_seconds, 2) if batch_seconds else None,
+        "output_bytes": total_bytes,
+        "mean_sheet_bytes": round(total_bytes / produced) if produced else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_workers_mb": peak_rss_mb(children=True),
+    }
+
+
+def run_roster_scale(size, homework, seed, criteria_path=CRITERIA_PATH):
+    """Список из size студентов: запись и чтение CSV, индекс групп, расчёт всех оценок."""
+    from batch import build_roster_index, normalize_selection, score_selection
+    from criteria import load_criteria
+    from roster import read_student_list, write_student_list
+
+    criteria = load_criteria(criteria_path, use_cache=False)
+    records = synthetic_roster(size, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "student_list.csv")
+        write_student_list(records, filename)
+        csv_bytes = os.path.getsize(filename)
+        del records
+        load_started = time.perf_counter()
+        records = read_student_list(filename)
+        load_ms = (time.perf_counter() - load_started) * 1000
+
+    index_started = time.perf_counter()
+    roster_index = build_roster_index(records)
+    index_ms = (time.perf_counter() - index_started) * 1000
+
+    scoring_started = time.perf_counter()
+    scored = 0
+    for raw in synthetic_selections(records, homework, criteria, seed=seed):
+        score_selection(normalize_selection(raw, homework, criteria, roster_index, 29), criteria)
+        scored += 1
+    scoring_seconds = time.perf_counter() - scoring_started
+
+    return {
+        "students": size,
+        "groups": len(roster_index.groups),
+        "homework": homework,
+        "csv_bytes": csv_bytes,
+        "load_ms": round(load_ms, 1),
+        "index_ms": round(index_ms, 1),
+        "scored_per_second": round(scored / scoring_seconds, 1) if scoring_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _rounded(value):
+    return None if value is None else round(value, 2)
+
+
+def _child(argv):
+    """Точка входа дочернего процесса: печатает результат одной строкой JSON."""
+    kind, *params = argv
+    if kind == "case":
+        homework, mode, samples, sheets, jobs, seed, launched_at, criteria_path = params
+        result = run_case(
+            homework, None if mode == "-" else mode, int(samples), int(sheets), int(jobs),
+            int(seed), float(launched_at), criteria_path,
+        )
+    else:
+        size, homework, seed, criteria_path = params
+        result = run_roster_scale(int(size), homework, int(seed), criteria_path)
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+
+def _spawn(*params):
+    # Каждый замер — в новом процессе: честный холодный старт и свой пик памяти
+    env = dict(os.environ, PYTHONHASHSEED="0")
+    env.pop("EVALUATION_TRACE", None)
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", *map(str, params)],
+        capture_output=True, text=True, encoding="utf-8", env=env,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip() or f"код {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_suite(sizes=DEFAULT_SIZES, samples=20, sheets=40, jobs=1, seed=DEFAULT_SEED,
+              criteria_path=CRITERIA_PATH, cases=None, log=print):
+    """Прогоняет все случаи и размеры списков; возвращает словарь результатов."""
+    from criteria import load_criteria
+
+    criteria = load_criteria(criteria_path, use_cache=False)
+    all_cases = benchmark_cases(criteria)
+    if cases:
+        all_cases = [case for case in all_cases if case[0] in cases or case[1] in cases]
+    # Для списков — работа с наибольшим числом разделов
+    largest = max(
+        criteria.homework_names, key=lambda name: len(criteria.homeworks[name].sections(False))
+    )
+    results = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "sizes": list(sizes),
+            "samples": samples,
+            "sheets": sheets,
+            "jobs": jobs,
+            "seed": seed,
+        },
+        "cases": {},
+        "roster": {},
+    }
+    for name, homework, mode in all_cases:
+        result = _spawn(
+            "case", homework, mode or "-", samples, sheets, jobs, seed, repr(time.time()), criteria_path
+        )
+        results["cases"][name] = result
+        log(
+            f"{name:<28} старт {result['cold_start_ms']:8.1f} мс  "
+            f"p50 {result['latency_p50_ms']:7.1f}  p90 {result['latency_p90_ms']:7.1f}  "
+            f"p99 {result['latency_p99_ms']:7.1f} мс  {result['sheets_per_second']:6.2f} лист/с  "
+            f"RSS {result['peak_rss_mb']} МБ  {result['mean_sheet_bytes'] / 1024:6.1f} КБ/лист"
+        )
+    for size in sizes:
+        result = _spawn("roster", size, largest, seed, criteria_path)
+        results["roster"][str(size)] = result
+        log(
+            f"список {size:>7} студентов: чтение {result['load_ms']:8.1f} мс  "
+            f"индекс {result['index_ms']:7.1f} мс  расчёт {result['scored_per_second']:9.1f} студ/с  "
+            f"RSS {result['peak_rss_mb']} МБ"
+        )
+    results["meta"]["pillow"] = next(
+        (result["pillow"] for result in results["cases"].values()), None
+    )
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Регрессии относительно baseline: список (метрика, было, стало, изменение).
+
+    Изменение — доля ухудшения (0.2 — на 20% хуже). Метрики, которых нет в
+    одном из файлов, и разница во времени меньше NOISE_FLOOR_MS пропускаются.
+    """
+    regressions = []
+    for section, metrics in (("cases", CASE_METRICS), ("roster", ROSTER_METRICS)):
+        for name, current in results.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                continue
+            for metric, higher_is_better in metrics.items():
+                old, new = previous.get(metric), current.get(metric)
+                if not old or new is None:
+                    continue
+                if metric.endswith("_ms") and abs(new - old) < NOISE_FLOOR_MS:
+                    continue
+                change = (old - new) / old if higher_is_better else (new - old) / old
+                if change > threshold:
+                    regressions.append((f"{section}/{name}/{metric}", old, new, change))
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--child"]:
+        return _child(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description="Бенчмарк формирования оценочных листов без графического интерфейса."
+    )
+    parser.add_argument(
+        "--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+        help="размеры списков студентов через запятую (по умолчанию 30,1000,10000,100000)",
+    )
+    parser.add_argument("--samples", type=int, default=20, help="листов для перцентилей задержки (по умолчанию 20)")
+    parser.add_argument("--sheets", type=int, default=40, help="листов в пакете для пропускной способности (по умолчанию 40)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="рабочих процессов пакета (по умолчанию 1)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="зерно генератора выбора")
+    parser.add_argument("--criteria", default=CRITERIA_PATH, help="файл критериев")
+    parser.add_argument(
+        "--case", action="append", dest="cases",
+        help="только этот случай или домашняя работа (можно повторять)",
+    )
+    parser.add_argument("--output", default=RESULTS_FILENAME, help=f"файл результатов (по умолчанию {RESULTS_FILENAME})")
+    parser.add_argument("--baseline", help="сравнить с сохранёнными результатами")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help=f"допустимое ухудшение метрики, доля (по умолчанию {DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help=f"записать результаты как базовые ({BASELINE_FILENAME} или --baseline)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    except ValueError:
+        parser.error("Размеры списков должны быть целыми числами.")
+    if any(size <= 0 for size in sizes) or args.samples <= 0 or args.sheets <= 0 or args.jobs <= 0:
+        parser.error("Размеры, --samples, --sheets и --jobs должны быть положительными.")
+
+    baseline = None
+    if args.baseline and not args.save_baseline:
+        try:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"Не удалось прочитать базовые результаты: {e}")
+
+    try:
+        results = run_suite(
+            sizes, args.samples, args.sheets, args.jobs, args.seed, args.criteria, args.cases
+        )
+    except RuntimeError as e:
+        print(f"Замер завершился с ошибкой: {e}", file=sys.stderr)
+        return 2
+    data = json.dumps(results, ensure_ascii=False, indent=2)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(data)
+    print(f"Результаты: {args.output}")
+    if args.save_baseline:
+        path = args.baseline or BASELINE_FILENAME
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+        print(f"Базовые результаты: {path}")
+        return 0
+    if baseline is None:
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if not regressions:
+        print(f"Регрессий нет (порог {args.threshold:.0%}).")
+        return 0
+    print(f"Регрессии (порог {args.threshold:.0%}):")
+    for metric, old, new, change in regressions:
+        print(f"  {metric}: {old} -> {new} (хуже на {change:.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Копирование готового листа в буфер обмена.
+
+На Windows используется win32clipboard (картинка в формате DIB), в Linux —
+внешняя утилита, которой PNG передаётся через stdin: wl-copy в сеансе
+Wayland, xclip в X11. Утилиты ищутся в PATH; вместо поиска команду можно
+задать явно — аргументом command у copy_png или переменной окружения
+EVALUATION_CLIPBOARD_COMMAND (например, «wl-copy --type image/png»). Так
+копирование проверяется без графического сеанса, заглушкой на месте
+утилиты:
+
+    python clipboard.py --self-test
+"""
+
+import argparse
+import io
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Команды Linux: (имя утилиты, аргументы, переменная окружения сеанса)
+LINUX_BACKENDS = (
+    ("wl-copy", ("--type", "image/png"), "WAYLAND_DISPLAY"),
+    ("xclip", ("-selection", "clipboard", "-t", "image/png", "-i"), "DISPLAY"),
+)
+# Команда копирования вместо поиска утилит (строка в синтаксисе shell)
+CLIPBOARD_COMMAND_ENV = "EVALUATION_CLIPBOARD_COMMAND"
+# Быстрое сжатие: в буфере PNG живёт недолго
+CLIPBOARD_PNG_LEVEL = 1
+
+
+class ClipboardError(RuntimeError):
+    """Скопировать не удалось; текст сообщения показывается пользователю."""
+
+
+def linux_command(environ=None):
+    """Команда для копирования PNG в текущем сеансе или None.
+
+    Команда из EVALUATION_CLIPBOARD_COMMAND, если переменная задана,
+    используется как есть.
+    """
+    environ = os.environ if environ is None else environ
+    override = environ.get(CLIPBOARD_COMMAND_ENV, "").strip()
+    if override:
+        return shlex.split(override)
+    available = [
+        (name, args, session)
+        for name, args, session in LINUX_BACKENDS
+        if shutil.which(name, path=environ.get("PATH"))
+    ]
+    # Сначала утилита своего сеанса, затем любая найденная
+    for name, args, session in available:
+        if environ.get(session):
+            return [shutil.which(name, path=environ.get("PATH")), *args]
+    if available:
+        name, args, _ = available[0]
+        return [shutil.which(name, path=environ.get("PATH")), *args]
+    return None
+
+
+def copy_png(data, environ=None, command=None):
+    """Передаёт PNG-байты утилите буфера обмена Linux.
+
+    command — список аргументов вместо найденной linux_command утилиты.
+    """
+    if command is None:
+        command = linux_command(environ)
+    if command is None:
+        raise ClipboardError(
+            "Для копирования в буфер обмена установите xclip (X11) или wl-clipboard (Wayland)."
+        )
+    try:
+        # Утилиты остаются в фоне владельцем буфера, поэтому их вывод не читаем
+        completed = subprocess.run(
+            command,
+            input=data,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=environ,
+            timeout=10,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ClipboardError(f"Не удалось запустить {os.path.basename(command[0])}: {e}") from e
+    if completed.returncode != 0:
+        raise ClipboardError(
+            f"{os.path.basename(command[0])} завершился с кодом {completed.returncode}."
+        )
+
+
+def _copy_windows(image):
+    try:
+        import win32clipboard
+    except ImportError as e:
+        raise ClipboardError("Для копирования в буфер обмена установите pywin32.") from e
+
+    output = io.BytesIO()
+    image.convert("RGB").save(output, "BMP")
+    # Без 14-байтового заголовка файла BMP остаётся DIB
+    data = output.getvalue()[14:]
+    output.close()
+    win32clipboard.OpenClipboard()
+    try:
+        win32clipboard.EmptyClipboard()
+        win32clipboard.SetClipboardData(win32clipboard.CF_DIB, data)
+    finally:
+        win32clipboard.CloseClipboard()
+
+
+def copy_image(image):
+    """Копирует изображение Pillow в буфер обмена; ClipboardError при неудаче."""
+    if sys.platform.startswith("win"):
+        _copy_windows(image)
+    elif sys.platform.startswith("linux"):
+        from output import encode_sheet
+
+        copy_png(encode_sheet(image, "png", CLIPBOARD_PNG_LEVEL))
+    else:
+        raise ClipboardError(
+            "Копирование изображения в буфер обмена поддерживается только на Windows и Linux."
+        )
+
+
+# Заглушка утилиты: сохраняет stdin в файл из первого аргумента и выходит
+# с кодом из второго
+_STUB_SOURCE = """\
+import sys
+data = sys.stdin.buffer.read()
+with open(sys.argv[1], "wb") as f:
+    f.write(data)
+sys.exit(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+"""
+
+
+def self_test():
+    """Проверяет copy_png с заглушкой вместо xclip/wl-copy; True при успехе."""
+    from PIL import Image
+
+    from output import encode_sheet
+
+    data = encode_sheet(Image.new("RGB", (8, 4), (255, 0, 0)), "png", CLIPBOARD_PNG_LEVEL)
+    with tempfile.TemporaryDirectory() as tmp:
+        stub = os.path.join(tmp, "clipboard_stub.py")
+        received = os.path.join(tmp, "received.png")
+        with open(stub, "w", encoding="utf-8") as f:
+            f.write(_STUB_SOURCE)
+        checks = []
+
+        copy_png(data, command=[sys.executable, stub, received])
+        with open(received, "rb") as f:
+            checks.append(("аргумент command", f.read() == data))
+        os.remove(received)
+
+        environ = dict(os.environ)
+        environ[CLIPBOARD_COMMAND_ENV] = shlex.join([sys.executable, stub, received])
+        copy_png(data, environ=environ)
+        with open(received, "rb") as f:
+            checks.append((CLIPBOARD_COMMAND_ENV, f.read() == data))
+
+        try:
+            copy_png(data, command=[sys.executable, stub, received, "3"])
+        except ClipboardError as e:
+            checks.append(("код возврата утилиты", "кодом 3" in str(e)))
+        else:
+            checks.append(("код возврата утилиты", False))
+
+    for name, ok in checks:
+        print(f"{'ок' if ok else 'ОШИБКА':<7} {name}")
+    return all(ok for _, ok in checks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Копирование листа в буфер обмена")
+    parser.add_argument(
+        "--self-test", action="store_true",
+        help="проверить передачу PNG утилите буфера обмена через заглушку",
+    )
+    args = parser.parse_args(argv)
+    if not args.self_test:
+        parser.print_help()
+        return 0
+    return 0 if self_test() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
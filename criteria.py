@@ -0,0 +1,229 @@
+"""Скомпилированная модель criteria.json с двоичным кэшем.
+
+load_criteria разбирает JSON один раз и приводит его к компактным объектам
+со __slots__: баллы уже преобразованы во float, для каждого раздела известен
+вариант с максимальным баллом, для каждого задания — разбиение base/extended.
+Разобранные словари и хэши версий заданий сохраняются в criteria.cache рядом
+с JSON (marshal — только простые данные, при чтении код не выполняется),
+объекты собираются из них заново. Кэш сбрасывается, если у JSON изменились
+время модификации и содержимое (SHA-256).
+
+Homework.version — хэш критериев задания вместе с общими штрафами,
+поощрениями и правилами просрочки; по нему render_cache понимает, что
+рубрика изменилась и листы надо перерисовать.
+
+Исходные словари остаются доступны (Criteria.data, Section.raw) — их
+используют scoring.compute_report и виджеты GUI.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+
+CRITERIA_FILENAME = "criteria.json"
+CACHE_VERSION = 3
+
+
+def _cache_path_for(path):
+    return os.path.splitext(path)[0] + ".cache"
+
+
+class Option:
+    __slots__ = ("text", "score", "suboptions")
+
+    def __init__(self, raw):
+        self.text = raw.get("text", "")
+        self.score = float(raw.get("score", 0.0))
+        self.suboptions = tuple(raw.get("suboptions") or ())
+
+
+class Section:
+    __slots__ = (
+        "title",
+        "type",
+        "max_score",
+        "options",
+        "max_option_index",
+        "raw",
+    )
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.title = raw.get("title", "")
+        self.type = raw.get("type", "")
+        self.max_score = float(raw.get("max_score", 0))
+        self.options = tuple(Option(option) for option in raw.get("options", []))
+        scores = [option.score for option in self.options]
+        # Первый вариант с максимальным баллом, как max() в set_criteria_to_max
+        self.max_option_index = scores.index(max(scores)) if scores else None
+
+
+class Homework:
+    __slots__ = (
+        "name",
+        "version",
+        "base",
+        "extended",
+        "has_extended",
+        "_section_dicts",
+    )
+
+    def __init__(self, name, source, version=""):
+        self.name = name
+        self.version = version
+        if isinstance(source, dict):
+            base = source.get("base", [])
+            extended = source.get("extended", [])
+            self.has_extended = True
+        else:
+            base = source if isinstance(source, list) else []
+            extended = []
+            self.has_extended = False
+        self.base = tuple(Section(section) for section in base)
+        self.extended = tuple(Section(section) for section in extended)
+        self._section_dicts = {
+            True: [section.raw for section in self.base],
+            False: [section.raw for section in self.base + self.extended],
+        }
+
+    def sections(self, limit_to_eight):
+        """Разделы Section для режима «вариант на 8» (base) или полного (base + extended)."""
+        return self.base if limit_to_eight else self.base + self.extended
+
+    def section_dicts(self, limit_to_eight):
+        """Те же разделы в виде исходных словарей (общий список, не изменять)."""
+        return self._section_dicts[bool(limit_to_eight)]
+
+
+class Penalty:
+    __slots__ = ("text", "score", "disqualifying")
+
+    def __init__(self, raw):
+        self.text = raw.get("text", "")
+        self.score = float(raw.get("score", 0))
+        self.disqualifying = self.score <= -1000
+
+
+class Reward:
+    __slots__ = ("text", "score")
+
+    def __init__(self, raw):
+        self.text = raw.get("text", "").strip()
+        self.score = float(raw.get("score", 0) or 0)
+
+
+class Criteria:
+    __slots__ = (
+        "data",
+        "homeworks",
+        "homework_names",
+        "penalties",
+        "rewards",
+        "delay_text",
+        "delay_score_per_day",
+    )
+
+    def __init__(self, data, versions=None):
+        self.data = data
+        sections = data.get("sections", {})
+        self.homework_names = list(sections.keys())
+        if versions is None:
+            versions = _homework_versions(data)
+        self.homeworks = {
+            name: Homework(name, source, versions.get(name, ""))
+            for name, source in sections.items()
+        }
+        self.penalties = tuple(Penalty(raw) for raw in data.get("penalties", []))
+        self.rewards = tuple(Reward(raw) for raw in data.get("rewards", []))
+        delay_info = data.get("delays", {})
+        self.delay_text = delay_info.get("text", "")
+        self.delay_score_per_day = delay_info.get("score_per_day", 0)
+
+    @classmethod
+    def empty(cls):
+        return cls({"sections": {}, "penalties": [], "rewards": [], "delays": {}})
+
+
+def _canonical_json(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def _homework_versions(data):
+    shared = _canonical_json(
+        [data.get("penalties", []), data.get("rewards", []), data.get("delays", {})]
+    )
+    return {
+        name: hashlib.sha256((_canonical_json(source) + shared).encode("utf-8")).hexdigest()
+        for name, source in data.get("sections", {}).items()
+    }
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            cached = marshal.loads(f.read())
+        if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION:
+            return None, None
+        data = cached["data"]
+        versions = cached["versions"]
+        if not isinstance(data, dict) or not isinstance(versions, dict):
+            return None, None
+        return cached, Criteria(data, versions)
+    except Exception:
+        # Повреждённый или чужой кэш просто пересобирается
+        return None, None
+
+
+def _write_cache(cache_path, meta, criteria):
+    tmp_path = cache_path + ".tmp"
+    cached = dict(meta)
+    cached["data"] = criteria.data
+    cached["versions"] = {name: homework.version for name, homework in criteria.homeworks.items()}
+    try:
+        with open(tmp_path, "wb") as f:
+            marshal.dump(cached, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Папка только для чтения — работаем без кэша
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_criteria(path=CRITERIA_FILENAME, cache_path=None, use_cache=True):
+    """Возвращает Criteria, по возможности из двоичного кэша.
+
+    Ошибки чтения и разбора JSON (OSError, ValueError) пробрасываются.
+    """
+    if cache_path is None:
+        cache_path = _cache_path_for(path)
+    stat = os.stat(path)
+    meta, criteria = _read_cache(cache_path) if use_cache else (None, None)
+    if (
+        criteria is not None
+        and meta.get("mtime_ns") == stat.st_mtime_ns
+        and meta.get("size") == stat.st_size
+    ):
+        return criteria
+
+    with open(path, "rb") as f:
+        raw_bytes = f.read()
+    digest = hashlib.sha256(raw_bytes).hexdigest()
+    new_meta = {
+        "version": CACHE_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest,
+    }
+    if criteria is not None and meta.get("sha256") == digest:
+        # Файл «тронут», но не изменён: обновляем только отметку времени
+        if use_cache:
+            _write_cache(cache_path, new_meta, criteria)
+        return criteria
+
+    criteria = Criteria(json.loads(raw_bytes.decode("utf-8")))
+    if use_cache:
+        _write_cache(cache_path, new_meta, criteria)
+    return criteria
@@ -0,0 +1,127 @@
+"""Черновики оценивания: состояние критериев каждого студента между переходами.
+
+При переходе к другому студенту GUI сохраняет выбор текущего (в формате
+scoring, без ФИО/группы/варианта) под ключом (домашняя работа, группа,
+студент), а при возвращении восстанавливает его. Черновики хранятся в
+памяти и в фоновом потоке записываются в drafts.json — не чаще раза в
+секунду и через временный файл, так что переходы не ждут диска.
+"""
+
+import json
+import os
+import threading
+
+DRAFTS_FILENAME = "drafts.json"
+# Поля выбора, которые относятся к оцениванию, а не к студенту
+DRAFT_FIELDS = (
+    "on_time",
+    "delay",
+    "comment",
+    "double_mode",
+    "limit_to_eight",
+    "sections",
+    "penalties",
+    "rewards",
+)
+
+
+def draft_state(selection):
+    """Часть выбора, которая сохраняется в черновике."""
+    return {field: selection[field] for field in DRAFT_FIELDS if field in selection}
+
+
+class DraftStore:
+    """Черновики в памяти с фоновой записью в path (None — только в памяти)."""
+
+    def __init__(self, path=DRAFTS_FILENAME, delay=1.0):
+        self.path = path
+        self.delay = delay
+        self._drafts = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._version = 0
+        self._saved_version = 0
+        self._thread = None
+        if path is None:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for homework, group, student, state in entries:
+                self._drafts[(homework, group, student)] = state
+        except (OSError, ValueError, TypeError):
+            # Нет файла или он повреждён — начинаем с пустых черновиков
+            pass
+
+    def __len__(self):
+        with self._lock:
+            return len(self._drafts)
+
+    def get(self, key):
+        """Черновик для (домашняя работа, группа, студент) или None."""
+        with self._lock:
+            return self._drafts.get(key)
+
+    def put(self, key, state):
+        with self._lock:
+            if self._drafts.get(key) == state:
+                return
+            self._drafts[key] = state
+            self._version += 1
+        self._schedule()
+
+    def discard(self, key):
+        with self._lock:
+            if self._drafts.pop(key, None) is None:
+                return
+            self._version += 1
+        self._schedule()
+
+    def close(self):
+        """Останавливает фоновую запись и сохраняет несохранённые черновики."""
+        self._stop.set()
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._write()
+
+    def _schedule(self):
+        if self._thread is None and not self._stop.is_set():
+            self._thread = threading.Thread(
+                target=self._run, name="drafts-writer", daemon=True
+            )
+            self._thread.start()
+        self._changed.set()
+
+    def _run(self):
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            # Серия быстрых переходов записывается одним файлом; close()
+            # прерывает ожидание и дописывает черновики сам
+            if self._stop.wait(self.delay):
+                return
+            self._write()
+
+    def _write(self):
+        with self._lock:
+            version = self._version
+            if version == self._saved_version or self.path is None:
+                return
+            entries = [
+                [homework, group, student, state]
+                for (homework, group, student), state in self._drafts.items()
+            ]
+        data = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Папка только для чтения — черновики живут до закрытия программы
+            return
+        with self._lock:
+            self._saved_version = version
@@ -0,0 +1,165 @@
+"""Упаковка каталога emoji_images в один файл-атлас и его чтение через mmap.
+
+Формат файла:
+    8 байт   сигнатура ATLAS_MAGIC
+    4 байта  длина индекса (uint32, little-endian)
+    N байт   индекс в JSON: {"source": [число PNG, новейший mtime_ns],
+             "entries": {"1f600": [смещение, длина], ...}}
+    далее    PNG-файлы подряд; смещения отсчитываются от начала этой области
+
+"source" — отпечаток каталога на момент сборки (source_signature). Если
+каталог с тех пор изменился (добавили, удалили или заменили PNG), open_atlas
+не открывает устаревший атлас, и эмодзи читаются из каталога, пока атлас не
+пересоберут.
+
+Сборка атласа:
+    python emoji_atlas.py [--source emoji_images] [--output emoji_atlas.bin]
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+
+ATLAS_MAGIC = b"EMJATL02"
+_HEADER = struct.Struct("<8sI")
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+EMOJI_ATLAS_PATH = os.path.join(BASE_PATH, "emoji_atlas.bin")
+
+logger = logging.getLogger(__name__)
+
+
+def _png_entries(source_dir):
+    with os.scandir(source_dir) as entries:
+        return [entry for entry in entries if entry.name.lower().endswith(".png")]
+
+
+def source_signature(source_dir):
+    """[число PNG, новейший mtime_ns] каталога или None, если каталога нет."""
+    try:
+        entries = _png_entries(source_dir)
+        newest = max((entry.stat().st_mtime_ns for entry in entries), default=0)
+    except OSError:
+        return None
+    return [len(entries), newest]
+
+
+def build_atlas(source_dir, output_path):
+    """Собирает атлас из PNG-файлов каталога и возвращает число эмодзи."""
+    signature = source_signature(source_dir)
+    names = sorted(entry.name for entry in _png_entries(source_dir))
+    index = {}
+    blobs = []
+    offset = 0
+    for name in names:
+        with open(os.path.join(source_dir, name), "rb") as f:
+            data = f.read()
+        index[name[:-4].lower()] = [offset, len(data)]
+        blobs.append(data)
+        offset += len(data)
+
+    index_bytes = json.dumps(
+        {"source": signature, "entries": index}, separators=(",", ":")
+    ).encode("utf-8")
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(ATLAS_MAGIC, len(index_bytes)))
+        f.write(index_bytes)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp_path, output_path)
+    return len(index)
+
+
+class EmojiAtlas:
+    """Атлас, отображённый в память: поиск — словарь плюс срез без копирования."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, index_length = _HEADER.unpack_from(self._mm, 0)
+            if magic != ATLAS_MAGIC:
+                raise ValueError(f"{path}: неизвестный формат атласа эмодзи")
+            index_start = _HEADER.size
+            self._data_start = index_start + index_length
+            header = json.loads(self._mm[index_start:self._data_start].decode("utf-8"))
+            self.source = header["source"]
+            index = header["entries"]
+        except Exception:
+            self._mm.close()
+            raise
+        self._index = {
+            seq: (self._data_start + start, self._data_start + start + length)
+            for seq, (start, length) in index.items()
+        }
+        self._view = memoryview(self._mm)
+
+    def __contains__(self, codepoint_seq):
+        return codepoint_seq in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def sequences(self):
+        return self._index.keys()
+
+    def get(self, codepoint_seq):
+        """Возвращает memoryview с PNG-данными эмодзи или None."""
+        bounds = self._index.get(codepoint_seq)
+        if bounds is None:
+            return None
+        return self._view[bounds[0]:bounds[1]]
+
+    def close(self):
+        self._view.release()
+        self._mm.close()
+
+
+def open_atlas(path=EMOJI_ATLAS_PATH, source_dir=None):
+    """Открывает атлас, если он собран и не устарел; иначе возвращает None.
+
+    Если передан source_dir и этот каталог есть, его отпечаток сверяется с
+    записанным при сборке. Без каталога атлас используется как есть.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        atlas = EmojiAtlas(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Атлас эмодзи не загружен: %s", e)
+        return None
+    if source_dir is not None:
+        signature = source_signature(source_dir)
+        if signature is not None and signature != atlas.source:
+            logger.warning(
+                "Атлас эмодзи %s устарел: каталог %s изменился после сборки, "
+                "эмодзи читаются из каталога (пересоберите: python emoji_atlas.py)",
+                path, source_dir,
+            )
+            atlas.close()
+            return None
+    return atlas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка атласа эмодзи")
+    parser.add_argument(
+        "--source", default=os.path.join(BASE_PATH, "emoji_images"),
+        help="каталог с PNG-файлами эмодзи",
+    )
+    parser.add_argument(
+        "--output", default=EMOJI_ATLAS_PATH, help="путь к файлу атласа"
+    )
+    args = parser.parse_args(argv)
+    count = build_atlas(args.source, args.output)
+    size_mb = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"Атлас собран: {count} эмодзи, {size_mb:.1f} МБ -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
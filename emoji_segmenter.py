@@ -0,0 +1,141 @@
+"""Разбиение строк на обычный текст и эмодзи.
+
+EmojiSegmenter строится один раз из последовательностей кодовых точек, для
+которых есть PNG (имена файлов emoji_images/ или ключи атласа), и ищет в
+строке самое длинное совпадение по префиксному дереву. Селектор варианта
+U+FE0F при сопоставлении не учитывается: «❤️» находит 2764.png, а «🏃🏻‍♀» —
+1f3c3-1f3fb-200d-2640-fe0f.png.
+
+Эмодзи без картинки (символы из блоков эмодзи Юникода вместе с модификаторами
+и ZWJ-продолжениями) тоже выделяются в отдельный сегмент: rendering рисует
+их шрифтом Segoe UI Emoji, а не основным шрифтом листа, где их нет.
+
+Строки без единого символа, с которого может начаться эмодзи (обычный
+латинский и русский текст, цифры, знаки препинания), возвращаются сразу.
+Результаты для остальных строк запоминаются: тексты критериев и поощрений
+повторяются в каждом листе.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+VARIATION_SELECTOR = "\ufe0f"
+ZERO_WIDTH_JOINER = "\u200d"
+# Ключ листа в узлах дерева: пустая строка не совпадает ни с одним символом
+_LEAF = ""
+
+# Блоки, из которых состоят эмодзи: разные технические знаки (⌚, ⏰),
+# разные символы и дингбаты (☀, ✂), стрелки и фигуры (⬛, ⭐) и дополнительные
+# плоскости эмодзи (🀄…🫸, включая флаги и оттенки кожи)
+_PICTOGRAPHIC = "\u2300-\u23ff\u2600-\u27bf\u2b00-\u2bff\U0001f000-\U0001faff"
+# Символы, которые продолжают эмодзи: селектор варианта, клавиша (#️⃣) и теги флагов
+_EXTENDERS = "\ufe0f\u20e3\U000e0020-\U000e007f"
+_FALLBACK = re.compile(
+    f"[{_PICTOGRAPHIC}][{_EXTENDERS}]*"
+    f"(?:{ZERO_WIDTH_JOINER}[{_PICTOGRAPHIC}][{_EXTENDERS}]*)*"
+)
+_HAS_PICTOGRAPHIC = re.compile(f"[{_PICTOGRAPHIC}]")
+
+
+def codepoints_to_text(codepoint_seq):
+    """'1f3c3-200d-2640-fe0f' -> строка из соответствующих символов."""
+    return "".join(chr(int(part, 16)) for part in codepoint_seq.split("-"))
+
+
+class EmojiSegmenter:
+    def __init__(self, sequences, memo_size=4096):
+        self._root = {}
+        triggers = set()
+        for codepoint_seq in sequences:
+            try:
+                text = codepoints_to_text(codepoint_seq)
+            except (ValueError, OverflowError):
+                # Посторонний файл в каталоге эмодзи
+                continue
+            key = text.replace(VARIATION_SELECTOR, "")
+            if not key:
+                continue
+            node = self._root
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node.setdefault(_LEAF, text)
+            # Для быстрой проверки достаточно одного обязательного символа на
+            # последовательность; берём первый не-ASCII (у «#️⃣» это U+20E3)
+            triggers.add(next((ch for ch in key if ch > "\x7f"), key[0]))
+        self._triggers = frozenset(triggers)
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_plain(self, text):
+        """True, если в строке заведомо нет эмодзи."""
+        return self._triggers.isdisjoint(text) and _HAS_PICTOGRAPHIC.search(text) is None
+
+    def match(self, text, start):
+        """Самое длинное эмодзи с позиции start: (конец, эмодзи) или None.
+
+        Возвращаемое эмодзи записано так же, как имя файла, поэтому
+        emoji_to_codepoints от него даёт имя существующего PNG.
+        """
+        node = self._root.get(text[start])
+        if node is None:
+            return None
+        best = None
+        pos = start + 1
+        length = len(text)
+        while True:
+            while pos < length and text[pos] == VARIATION_SELECTOR:
+                pos += 1
+            if _LEAF in node:
+                best = (pos, node[_LEAF])
+            if pos >= length:
+                break
+            node = node.get(text[pos])
+            if node is None:
+                break
+            pos += 1
+        return best
+
+    def split(self, text):
+        """Кортеж сегментов ('text', текст) и ('emoji', эмодзи)."""
+        if not text:
+            return ()
+        if self.is_plain(text):
+            return (("text", text),)
+        with self._lock:
+            segments = self._memo.get(text)
+            if segments is not None:
+                self._memo.move_to_end(text)
+                return segments
+
+        segments = self._split(text)
+
+        with self._lock:
+            self._memo[text] = segments
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return segments
+
+    def _split(self, text):
+        segments = []
+        text_start = 0
+        pos = 0
+        length = len(text)
+        while pos < length:
+            found = self.match(text, pos)
+            if found is None:
+                # Эмодзи без картинки — одним сегментом для шрифта эмодзи
+                fallback = _FALLBACK.match(text, pos)
+                if fallback is None:
+                    pos += 1
+                    continue
+                found = (fallback.end(), fallback.group())
+            end, emoji_text = found
+            if pos > text_start:
+                segments.append(("text", text[text_start:pos]))
+            segments.append(("emoji", emoji_text))
+            pos = text_start = end
+        if text_start < length:
+            segments.append(("text", text[text_start:]))
+        return tuple(segments)
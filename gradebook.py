@@ -0,0 +1,221 @@
+"""Журнал оценок в SQLite: каждый сформированный лист сохраняется и в базу.
+
+В таблице evaluations одна строка на (домашняя работа, группа, студент):
+итоговый балл, баллы по разделам, тексты штрафов и поощрений и сам выбор
+(см. scoring.py), по которому лист можно пересчитать. Повторное
+оценивание того же студента заменяет строку. Сводную таблицу курса
+(студенты × домашние работы) можно выгрузить в CSV:
+
+    python gradebook.py grades.csv [--db gradebook.sqlite3] [--criteria criteria.json]
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from scoring import format_score
+
+GRADEBOOK_FILENAME = "gradebook.sqlite3"
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (
+    homework TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    student TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    final_score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    on_time INTEGER NOT NULL,
+    delay_days INTEGER NOT NULL,
+    section_scores TEXT NOT NULL,
+    penalties TEXT NOT NULL,
+    rewards TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    selection TEXT NOT NULL,
+    rubric_version TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (homework, group_name, student)
+);
+CREATE INDEX IF NOT EXISTS evaluations_by_student
+    ON evaluations (group_name, student, homework, final_score);
+"""
+
+_UPSERT = """
+INSERT INTO evaluations (
+    homework, group_name, student, variant, final_score, max_score, on_time,
+    delay_days, section_scores, penalties, rewards, comment, selection,
+    rubric_version, updated_at
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (homework, group_name, student) DO UPDATE SET
+    variant = excluded.variant,
+    final_score = excluded.final_score,
+    max_score = excluded.max_score,
+    on_time = excluded.on_time,
+    delay_days = excluded.delay_days,
+    section_scores = excluded.section_scores,
+    penalties = excluded.penalties,
+    rewards = excluded.rewards,
+    comment = excluded.comment,
+    selection = excluded.selection,
+    rubric_version = excluded.rubric_version,
+    updated_at = excluded.updated_at
+"""
+
+
+def _json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class Gradebook:
+    """Соединение с базой оценок; используется из одного потока.
+
+    check_same_thread=False разрешает закрыть соединение из другого потока,
+    когда поток, который в него писал, уже остановлен (так GUI закрывает
+    соединение фонового потока отрисовки).
+    """
+
+    def __init__(self, path=GRADEBOOK_FILENAME, check_same_thread=True):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+        # WAL и synchronous=NORMAL: запись одной оценки не ждёт полного fsync
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._connection.commit()
+
+    def upsert(self, selection, report, rubric_version="", commit=True):
+        """Записывает или заменяет оценку студента.
+
+        selection — выбор в формате scoring, report — результат
+        scoring.compute_report. При commit=False изменения остаются в
+        открытой транзакции до commit(): так пакет из сотен студентов
+        пишется одной транзакцией.
+        """
+        self._connection.execute(
+            _UPSERT,
+            (
+                selection.get("homework", ""),
+                report["group"],
+                report["student"],
+                str(report["variant"]),
+                report["final_score"],
+                report["max_score_cap"],
+                int(report["on_time"]),
+                report["delay_days"],
+                _json(report["section_scores"]),
+                _json(report["penalty_comments"]),
+                _json(report["reward_comments"]),
+                report["comment"],
+                _json(selection),
+                rubric_version,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        if commit:
+            self._connection.commit()
+
+    def commit(self):
+        self._connection.commit()
+
+    def get(self, homework, group, student):
+        """Сохранённая оценка в виде словаря или None."""
+        cursor = self._connection.execute(
+            "SELECT * FROM evaluations WHERE homework = ? AND group_name = ? AND student = ?",
+            (homework, group, student),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        entry = dict(zip((column[0] for column in cursor.description), row))
+        for key in ("section_scores", "penalties", "rewards", "selection"):
+            entry[key] = json.loads(entry[key])
+        return entry
+
+    def homeworks(self):
+        return [
+            row[0]
+            for row in self._connection.execute(
+                "SELECT DISTINCT homework FROM evaluations ORDER BY homework"
+            )
+        ]
+
+    def export_csv(self, filename, homeworks=None):
+        """Сводная таблица: Группа, ФИО и итог по каждой домашней работе.
+
+        homeworks задаёт порядок столбцов (по умолчанию — все работы из
+        базы по алфавиту). Возвращает число студентов.
+        """
+        if homeworks is None:
+            homeworks = self.homeworks()
+        else:
+            # Работы, которых нет в criteria.json, но есть в базе, — в конце
+            known = set(homeworks)
+            homeworks = list(homeworks) + [hw for hw in self.homeworks() if hw not in known]
+        columns = {homework: index for index, homework in enumerate(homeworks)}
+        rows = self._connection.execute(
+            "SELECT group_name, student, homework, final_score FROM evaluations "
+            "ORDER BY group_name, student"
+        )
+        count = 0
+        with open(filename, "w", encoding="utf-8-sig", newline="") as csvfile:
+            writer = csv.writer(csvfile, delimiter=";")
+            writer.writerow(["Группа", "ФИО", *homeworks])
+            current = None
+            scores = None
+            for group, student, homework, final_score in rows:
+                if (group, student) != current:
+                    if current is not None:
+                        writer.writerow([*current, *scores])
+                        count += 1
+                    current = (group, student)
+                    scores = [""] * len(homeworks)
+                scores[columns[homework]] = format_score(final_score)
+            if current is not None:
+                writer.writerow([*current, *scores])
+                count += 1
+        return count
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Выгрузка сводной таблицы оценок курса в CSV."
+    )
+    parser.add_argument("output", help="CSV-файл для таблицы")
+    parser.add_argument("--db", default=GRADEBOOK_FILENAME, help=f"база оценок (по умолчанию {GRADEBOOK_FILENAME})")
+    parser.add_argument(
+        "--criteria", default="criteria.json",
+        help="criteria.json, из которого берётся порядок домашних работ",
+    )
+    args = parser.parse_args(argv)
+
+    homeworks = None
+    try:
+        from criteria import load_criteria
+
+        homeworks = load_criteria(args.criteria).homework_names
+    except (OSError, ValueError):
+        pass
+    started = time.perf_counter()
+    with Gradebook(args.db) as gradebook:
+        count = gradebook.export_csv(args.output, homeworks)
+    print(f"Студентов: {count}, выгрузка: {(time.perf_counter() - started) * 1000:.0f} мс -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,121 @@
+import time
+
+# Отсчёт для отчёта о времени запуска берётся до всех остальных импортов
+_STARTUP_STARTED = time.perf_counter()
+_STARTUP_CPU = time.process_time()
+
 import tkinter as tk
 from tkinter import ttk
 import tkinter.messagebox
-from PIL import Image, ImageDraw, ImageFont
 
-import csv
+from clipboard import ClipboardError, copy_image
+from criteria import Criteria, load_criteria
+from drafts import DraftStore, draft_state
+from gradebook import GRADEBOOK_FILENAME, Gradebook
+from output import DEFAULT_FORMAT, OUTPUT_FORMATS, save_sheet, sheet_path
+from render_cache import RenderIndex, render_key
+from render_worker import RenderWorker
+from roster import (
+    RosterIndex,
+    VariantJournal,
+    create_student_list_template,
+    read_student_list,
+    resolve_variant,
+)
+from scoring import ScoringError, compute_report, format_score
+import tracing
+
+import collections
+import contextlib
 import json
 import os
+import sqlite3
 import sys
 
-# Для копирования изображения в буфер обмена (Windows)
-if sys.platform.startswith("win"):
-    import win32clipboard
-    import io
+# Pillow импортируется при первом формировании листа, win32clipboard — при копировании
+
+STARTUP_TIMING_ENV = "EVALUATION_STARTUP_TIMING"
+
+
+class StartupTimer:
+    """Время этапов запуска: от начала main.py до первого отрисованного окна.
+
+    Отчёт печатается в stderr, если задана переменная окружения
+    EVALUATION_STARTUP_TIMING=1 или передан ключ --startup-timing.
+    """
+
+    def __init__(self, started, cpu_before_start=0.0):
+        self.started = started
+        self.last = started
+        self.cpu_before_start = cpu_before_start
+        self.marks = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.marks.append((name, now - self.last))
+        self.last = now
+
+    def report(self, stream=None):
+        stream = stream or sys.stderr
+        print("Время запуска:", file=stream)
+        print(f"  {'интерпретатор Python (CPU)':<36} {self.cpu_before_start * 1000:8.1f} мс", file=stream)
+        for name, seconds in self.marks:
+            print(f"  {name:<36} {seconds * 1000:8.1f} мс", file=stream)
+        total = self.last - self.started
+        print(f"  {'итого до первого кадра':<36} {total * 1000:8.1f} мс", file=stream)
+
+
+startup_timer = StartupTimer(_STARTUP_STARTED, _STARTUP_CPU)
 
-SUB_PATH = "created_files"
+
+def run_navigation_benchmark(app, steps=30, stream=None):
+    """Листает первую группу вперёд и назад и печатает затраты на один переход.
+
+    Для каждого перехода считаются время, перестроения списка разделов
+    (criteria_renders), впервые построенные виджеты разделов и вызовы
+    обработчиков trace. Проход назад попадает на черновики, сохранённые при
+    проходе вперёд. Черновики бенчмарка в drafts.json не пишутся.
+    """
+    stream = stream or sys.stderr
+    app.drafts.close()
+    app.drafts = DraftStore(None)
+    if not app.hw_name_var.get() and app.criteria.homework_names:
+        app.hw_name_var.set(app.criteria.homework_names[0])
+        app.on_homework_selected(None)
+    group = next((group for group in app.groups if len(app.roster.names(group)) > 1), None)
+    if group is None:
+        print("Нет группы хотя бы с двумя студентами.", file=stream)
+        return
+    app.group_var.set(group)
+    app.update_student_list(None)
+    app.master.update()
+    steps = min(steps, len(app.student_names) - 1)
+
+    for title, action in (("вперёд", app.next_student), ("назад", app.prev_student)):
+        totals = collections.Counter()
+        elapsed = 0.0
+        for _ in range(steps):
+            app.ui_stats.clear()
+            started = time.perf_counter()
+            action()
+            app.master.update_idletasks()
+            elapsed += time.perf_counter() - started
+            totals.update(app.ui_stats)
+        print(f"Переходы {title} ({steps}, группа {group}), в среднем на переход:", file=stream)
+        print(f"  {'время':<32} {elapsed / steps * 1000:8.2f} мс", file=stream)
+        for name in sorted(totals):
+            print(f"  {name:<32} {totals[name] / steps:8.2f}", file=stream)
+
+
+def startup_timing_enabled(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    return "--startup-timing" in argv or os.environ.get(STARTUP_TIMING_ENV, "") not in ("", "0")
+
+
+# Правки вариантов дописываются в журнал через полсекунды после последней,
+# а student_list.csv перезаписывается после 5 секунд без правок или при выходе
+VARIANT_JOURNAL_DELAY_MS = 500
+ROSTER_COMPACT_DELAY_MS = 5000
 
 
 class EvaluationApp:
@@ -27,6 +129,7 @@ class EvaluationApp:
 
         # Загрузка данных о студентах
         self.load_student_data()
+        startup_timer.mark("список студентов")
 
         # Создаем вкладки
         self.notebook = ttk.Notebook(master)
@@ -50,12 +153,41 @@ class EvaluationApp:
 
         self.section_max_scores = {}
         self.current_criteria_source = None
+        self.current_sections = ()
+        # Шаблоны неизменных строк листа по домашним работам (rendering.SheetTemplate)
+        self.sheet_templates = {}
+        # Формат сохраняемых листов (см. output.OUTPUT_FORMATS)
+        self.output_format_var = tk.StringVar(value=DEFAULT_FORMAT)
+        # Отрисовка и сохранение листов идут в фоновом потоке
+        self.render_worker = RenderWorker()
+        self._render_poll_scheduled = False
+        # Последний нарисованный лист: (ключ выбора, изображение) для копирования
+        self._last_render = None
+        # Ключи сохранённых листов (render_cache); читается при первом сохранении
+        self.render_index = None
+        # База оценок (gradebook.sqlite3): соединение потока Tk только читает
+        # сохранённые оценивания, записывает оценки фоновый поток своим соединением
+        self.gradebook = None
+        self.worker_gradebook = None
+        # Черновики оценивания по студентам и ключ показанного сейчас студента
+        self.drafts = DraftStore()
+        self._draft_key = None
+        # (ключ, черновик) последнего сохранённого листа: его не нужно хранить в drafts.json
+        self._saved_draft = None
+        # Счётчики перестроений и вызовов trace (см. --navigation-benchmark)
+        self.ui_stats = collections.Counter()
+        self._trace_suspend_depth = 0
 
         self.create_info_tab()
+        startup_timer.mark("вкладка «Информация о студенте»")
         self.create_criteria_tab()
         self.load_info_parameters()
+        startup_timer.mark("вкладка «Критерии оценки»")
         self.create_penalty_tab()
         self.create_report_tab()
+        # Черновик студента из прошлого сеанса: при загрузке параметров
+        # вкладки штрафов и отчёта ещё не было
+        self._restore_draft()
         self.register_shortcuts()
 
         # Строка состояния
@@ -69,6 +201,16 @@ class EvaluationApp:
 
     def on_closing(self):
         self.save_info_parameters()
+        self._stash_draft()
+        self.drafts.close()
+        if self.variant_journal.has_entries:
+            self.save_student_list()
+        # Дописываем листы, которые ещё в очереди
+        self.render_worker.close()
+        if self.worker_gradebook is not None:
+            self.worker_gradebook.close()
+        if self.gradebook is not None:
+            self.gradebook.close()
         self.master.destroy()
 
     @staticmethod
@@ -90,6 +232,7 @@ class EvaluationApp:
             "on_time": self.on_time.get(),
             "double_mode_enabled": self.double_mode_enabled.get() if hasattr(self, "double_mode_enabled") else False,
             "work_variant_is_eight": self.limit_to_eight.get() if hasattr(self, "limit_to_eight") else True,
+            "output_format": self.output_format_var.get(),
         }
         with open("info_parameters.json", "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False)
@@ -102,123 +245,92 @@ class EvaluationApp:
             except json.JSONDecodeError:
                 with open("info_parameters.json", "r", encoding="utf-8-sig") as f:
                     data = json.load(f)
-                hw_name = self._normalize_homework_name(data.get("hw_name", ""))
-                self.hw_name_var.set(hw_name)
-                self.on_homework_selected(None)  # Обновляем критерии
-                self.variant_count_entry.delete(0, tk.END)
-                self.variant_count_entry.insert(0, data.get("variant_count", "29"))
-                self.group_var.set(data.get("group", ""))
-                # Обновление списка студентов на основе загруженной группы
-                self.update_student_list(None)
-                self.student_var.set(data.get("student", ""))
-                # Обновление информации о студенте на основе загруженного имени
-                self.update_student_info(None)
-                self.variant_entry.delete(0, tk.END)
-                self.variant_entry.insert(0, data.get("variant", ""))
-                self.on_time.set(data.get("on_time", True))
-                if hasattr(self, "double_mode_enabled"):
-                    self.double_mode_enabled.set(data.get("double_mode_enabled", False))
-                if hasattr(self, "limit_to_eight"):
-                    self.limit_to_eight.set(data.get("work_variant_is_eight", True))
-                self._sync_double_mode_controls()
+            hw_name = self._normalize_homework_name(data.get("hw_name", ""))
+            self.hw_name_var.set(hw_name)
+            self.on_homework_selected(None)  # Обновляем критерии
+            self.variant_count_entry.delete(0, tk.END)
+            self.variant_count_entry.insert(0, data.get("variant_count", "29"))
+            self.group_var.set(data.get("group", ""))
+            # Обновление списка студентов на основе загруженной группы
+            self.update_student_list(None)
+            self.student_var.set(data.get("student", ""))
+            # Обновление информации о студенте на основе загруженного имени
+            self.update_student_info(None)
+            self.variant_entry.delete(0, tk.END)
+            self.variant_entry.insert(0, data.get("variant", ""))
+            self.on_time.set(data.get("on_time", True))
+            if hasattr(self, "double_mode_enabled"):
+                self.double_mode_enabled.set(data.get("double_mode_enabled", False))
+            if hasattr(self, "limit_to_eight"):
+                self.limit_to_eight.set(data.get("work_variant_is_eight", True))
+            self._sync_double_mode_controls()
+            if data.get("output_format") in OUTPUT_FORMATS:
+                self.output_format_var.set(data["output_format"])
 
     def load_student_data(self):
         """Load student list from CSV, creating a scaffold file if it is absent."""
-        self.student_data = []
-        self.groups = set()
-        self.student_lookup = {}
+        self.roster = RosterIndex([])
+        self.student_data = self.roster.records
+        self.groups = []
         filename = "student_list.csv"
+        self.variant_journal = VariantJournal(filename)
+        self._variant_flush_job = None
+        self._roster_compact_job = None
         if not os.path.exists(filename):
-            with open(filename, "w", encoding="utf-8", newline="") as csvfile:
-                csvfile.write("ФИО;Группа;Номер Варианта\n")
+            create_student_list_template(filename)
             tk.messagebox.showwarning(
                 "Нет данных о студентах",
                 "Файл student_list.csv не найден. Создан шаблонный файл. "
                 "Добавьте студентов и перезапустите приложение.",
             )
-            self.groups = []
             return
 
-        def _read_students(delimiter):
-            with open(filename, encoding="utf-8-sig") as csvfile:
-                reader = csv.DictReader(csvfile, delimiter=delimiter)
-                for row in reader:
-                    normalized_row = {
-                        (key.strip().lstrip("\ufeff") if key else key): value
-                        for key, value in row.items()
-                    }
-                    fio = (
-                        normalized_row.get("ФИО")
-                        or " ".join(
-                            part
-                            for part in [
-                                normalized_row.get("Фамилия", "").strip(),
-                                normalized_row.get("Имя", "").strip(),
-                            ]
-                            if part
-                        )
-                    ).strip()
-                    group_name = (
-                        normalized_row.get("Группа")
-                        or normalized_row.get("Группы")
-                        or normalized_row.get("Данные о пользователе", "")
-                    ).strip()
-                    variant_number = (
-                        normalized_row.get("Номер Варианта")
-                        or normalized_row.get("Вариант")
-                        or ""
-                    ).strip()
-                    if not (fio and group_name):
-                        continue
-                    student_record = {
-                        "ФИО": fio,
-                        "Группа": group_name,
-                        "Номер Варианта": variant_number,
-                    }
-                    self.groups.add(group_name)
-                    self.student_data.append(student_record)
-                    self.student_lookup[(group_name, fio)] = student_record
-
-        # Попытка прочитать как CSV с разделителем ';', затем ','.
-        try:
-            _read_students(";")
-        except csv.Error:
-            self.student_data.clear()
-            self.student_lookup.clear()
-            _read_students(",")
-
-        self.groups = sorted(self.groups)
-        if not self.groups:
-            tk.messagebox.showwarning(
-                "Пустой список студентов",
-                "Не удалось найти валидные записи в student_list.csv. "
-                "Проверьте структуру файла (ФИО;Группа;Номер Варианта).",
-            )
-
-    def save_student_list(self):
-        filename = "student_list.csv"
-        fieldnames = ["ФИО", "Группа", "Номер Варианта"]
-        with open(filename, "w", encoding="utf-8", newline="") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=";")
-            writer.writeheader()
-            for record in self.student_data:
-                writer.writerow(
-                    {
-                        "ФИО": record.get("ФИО", ""),
-                        "Группа": record.get("Группа", ""),
-                        "Номер Варианта": record.get("Номер Варианта", ""),
-                    }
-                )
+        # Группы, порядок студентов и поиск по ФИО считаются один раз
+        self.roster = RosterIndex(read_student_list(filename))
+        self.student_data = self.roster.records
+        self.groups = self.roster.groups
+        if self.variant_journal.has_entries:
+            # Прошлый сеанс завершился до записи правок в список
+            self.variant_journal.replay(self.roster)
+            self.save_student_list()
+        if not self.groups:
+            tk.messagebox.showwarning(
+                "Пустой список студентов",
+                "Не удалось найти валидные записи в student_list.csv. "
+                "Проверьте структуру файла (ФИО;Группа;Номер Варианта).",
+            )
+
+    def save_student_list(self):
+        """Переносит все правки вариантов в student_list.csv и очищает журнал."""
+        for job in (self._variant_flush_job, self._roster_compact_job):
+            if job is not None:
+                self.master.after_cancel(job)
+        self._variant_flush_job = self._roster_compact_job = None
+        try:
+            self.variant_journal.compact(self.student_data)
+        except OSError as e:
+            if hasattr(self, "status_var"):
+                self.status_var.set(f"Не удалось сохранить список студентов: {e}")
+
+    def _flush_variant_journal(self):
+        self._variant_flush_job = None
+        try:
+            self.variant_journal.flush()
+        except OSError as e:
+            self.status_var.set(f"Не удалось записать журнал вариантов: {e}")
+
+    def _compact_roster(self):
+        self._roster_compact_job = None
+        self.save_student_list()
 
     def load_homework_names(self):
         try:
-            with open("criteria.json", "r", encoding="utf-8") as f:
-                self.criteria_data = json.load(f)
-            self.homework_names = list(self.criteria_data.get("sections", {}).keys())
+            self.criteria = load_criteria("criteria.json")
         except Exception as e:
-            self.criteria_data = {"sections": {}, "penalties": [], "rewards": [], "delays": {}}
+            self.criteria = Criteria.empty()
             tk.messagebox.showerror("Ошибка", f"Не удалось загрузить критерии: {e}")
-            self.homework_names = []
+        self.criteria_data = self.criteria.data
+        self.homework_names = list(self.criteria.homework_names)
 
     def create_info_tab(self):
         # Загрузка названий домашних заданий
@@ -319,19 +431,17 @@ class EvaluationApp:
         self._sync_double_mode_controls()
 
     def on_homework_selected(self, event):
+        self._stash_draft()
         selected_homework = self.hw_name_var.get()
         self.current_homework = selected_homework
         self.load_criteria_for_homework(selected_homework)
         # Нет необходимости обновлять штрафы и поощрения, так как они общие
+        self._restore_draft()
 
     def update_student_list(self, event):
         selected_group = self.group_var.get()
-        students_in_group = sorted(
-            [s for s in self.student_data if s["Группа"] == selected_group],
-            key=lambda x: x["ФИО"],
-        )
-        self.students_in_group = students_in_group  # Сохраняем для навигации
-        self.student_names = [s["ФИО"] for s in students_in_group]
+        self.students_in_group = self.roster.students(selected_group)  # Сохраняем для навигации
+        self.student_names = self.roster.names(selected_group)
         self.student_combobox["values"] = self.student_names
         if self.student_names:
             self.current_student_index = 0
@@ -340,32 +450,91 @@ class EvaluationApp:
 
     def set_criteria_to_max(self):
         # Устанавливаем критерии на максимальные баллы по умолчанию
-        for section, data in self.criteria_scores.items():
-            if data["type"] == "radio_with_subchecks":
-                # Найдём опцию с максимальным score
-                max_option = max(data["options"], key=lambda x: float(x.get("score", 0.0)))
-                data["main_var"].set(float(max_option["score"]))
-                # Сбрасываем субопции
-                for option in data["options"]:
-                    if "suboption_vars" in option:
-                        for var_cb in option["suboption_vars"]:
-                            var_cb.set(False)
-
-            elif data["type"] == "checkbox":
-                # Ставим True для всех чекбоксов с положительным score, чтобы получить максимум
-                for var_cb, var_score in data["vars"]:
-                    var_cb.set(var_score > 0)
+        for data in self.criteria_scores.values():
+            self._set_section_to_max(data)
+
+    @staticmethod
+    def _set_section_to_max(data):
+        if data["type"] == "radio_with_subchecks":
+            # Вариант с максимальным баллом известен заранее (criteria.Section)
+            section_info = data["section"]
+            if section_info.max_option_index is not None:
+                data["main_var"].set(section_info.options[section_info.max_option_index].score)
+            # Сбрасываем субопции
+            for option in data["options"]:
+                if "suboption_vars" in option:
+                    for var_cb in option["suboption_vars"]:
+                        var_cb.set(False)
+
+        elif data["type"] == "checkbox":
+            # Ставим True для всех чекбоксов с положительным score, чтобы получить максимум
+            for var_cb, var_score in data["vars"]:
+                var_cb.set(var_score > 0)
 
     def update_student_info(self, event):
-        selected_student_name = self.student_var.get()
-        if selected_student_name in self.student_names:
-            self.current_student_index = self.student_names.index(selected_student_name)
-            self.calculate_variant()
-            # После пересчёта варианта устанавливаем критерии на максимальные значения:
-            self.set_criteria_to_max()
-            if hasattr(self, "double_mode_enabled") and self.double_mode_enabled.get():
-                self.limit_to_eight.set(True)
-
+        self._stash_draft()
+        position = self.roster.position(self.group_var.get(), self.student_var.get())
+        if position is not None:
+            self.current_student_index = position
+            self.calculate_variant()
+            if self._restore_draft():
+                return
+            if self.double_mode_enabled.get() and not self.limit_to_eight.get():
+                # Перестроение списка разделов само выставит максимумы
+                self.limit_to_eight.set(True)
+            else:
+                # После пересчёта варианта устанавливаем критерии на максимальные значения:
+                self.set_criteria_to_max()
+
+    def _current_draft_key(self):
+        student = self.student_var.get()
+        if not student or not self.hw_name_var.get():
+            return None
+        return self.hw_name_var.get(), self.group_var.get(), student
+
+    def _stash_draft(self):
+        """Запоминает оценивание студента, от которого уходим."""
+        # До создания вкладки отчёта (загрузка параметров при запуске) запоминать нечего
+        if self._draft_key is None or not self.criteria_scores or not hasattr(self, "comment_text"):
+            return
+        state = draft_state(self.collect_selection())
+        if self._saved_draft == (self._draft_key, state):
+            # Лист с этим оцениванием уже сохранён и есть в базе оценок
+            return
+        self.drafts.put(self._draft_key, state)
+
+    def _restore_draft(self):
+        """Восстанавливает черновик показанного студента; False, если его нет.
+
+        Если черновика нет, но лист студента уже сохранялся, берётся
+        оценивание из базы оценок.
+        """
+        self._draft_key = self._current_draft_key()
+        if self._draft_key is None or not hasattr(self, "comment_text"):
+            return False
+        state = self.drafts.get(self._draft_key) or self._saved_grading(self._draft_key)
+        if state is None:
+            return False
+        self.apply_selection(state)
+        if hasattr(self, "status_var"):
+            self.status_var.set(f"Восстановлено оценивание: {self.student_var.get()}.")
+        return True
+
+    def _saved_grading(self, key):
+        """Оценивание из gradebook.sqlite3 в формате черновика или None."""
+        if self.gradebook is None:
+            if not os.path.exists(GRADEBOOK_FILENAME):
+                return None
+            try:
+                self.gradebook = Gradebook()
+            except sqlite3.Error:
+                return None
+        try:
+            entry = self.gradebook.get(*key)
+        except sqlite3.Error:
+            return None
+        return draft_state(entry["selection"]) if entry is not None else None
+
     def calculate_variant(self):
         raw_count = self.variant_count_entry.get().strip()
         try:
@@ -382,21 +551,11 @@ class EvaluationApp:
         student_number = self.current_student_index + 1  # Нумерация с 1
         group = self.group_var.get()
         student_name = self.student_var.get()
-        record = self.student_lookup.get((group, student_name))
-        variant_number = ""
-        if record:
-            variant_number = record.get("Номер Варианта", "").strip()
-
-        if not variant_number:
-            if student_number > variant_count:
-                variant_number = student_number % variant_count
-                if variant_number == 0:
-                    variant_number = variant_count
-            else:
-                variant_number = student_number
+        record = self.roster.record(group, student_name)
+        variant_number = resolve_variant(record, student_number, variant_count)
         self.variant_entry.configure(state="normal")
         self.variant_entry.delete(0, tk.END)
-        self.variant_entry.insert(0, str(variant_number))
+        self.variant_entry.insert(0, variant_number)
         self.variant_entry.configure(state="normal")
 
     def save_variant(self, event):
@@ -407,31 +566,63 @@ class EvaluationApp:
             if hasattr(self, "status_var"):
                 self.status_var.set("Введите числовое значение варианта.")
             return
-        record = self.student_lookup.get((group, student_name))
-        if record is not None:
-            record["Номер Варианта"] = variant_number
-            self.save_student_list()
+        record = self.roster.record(group, student_name)
+        if record is None or record["Номер Варианта"] == variant_number:
+            return
+        self.roster.set_variant(group, student_name, variant_number)
+        self.variant_journal.add(group, student_name, variant_number)
+        # Частые правки (Enter и уход фокуса) склеиваются в одну запись журнала
+        for job in (self._variant_flush_job, self._roster_compact_job):
+            if job is not None:
+                self.master.after_cancel(job)
+        self._variant_flush_job = self.master.after(
+            VARIANT_JOURNAL_DELAY_MS, self._flush_variant_journal
+        )
+        self._roster_compact_job = self.master.after(
+            ROSTER_COMPACT_DELAY_MS, self._compact_roster
+        )
 
     def prev_student(self):
         if self.current_student_index > 0:
+            self._stash_draft()
             self.current_student_index -= 1
             self.student_var.set(self.student_names[self.current_student_index])
             self.calculate_variant()
-        self.reset_fields()
-        # Устанавливаем критерии на максимальные значения
-        self.set_criteria_to_max()
+            if self._restore_draft():
+                return
+        self._apply_blank_selection()
 
     def next_student(self):
         if self.current_student_index < len(self.student_names) - 1:
+            self._stash_draft()
             self.current_student_index += 1
             self.student_var.set(self.student_names[self.current_student_index])
             self.calculate_variant()
-        self.reset_fields()
-        # Устанавливаем критерии на максимальные значения
-        self.set_criteria_to_max()
+            if self._restore_draft():
+                return
+        self._apply_blank_selection()
+
+    def _apply_blank_selection(self):
+        """Критерии на максимум; флажки, просрочка, штрафы, поощрения и комментарий — по умолчанию."""
+        self.apply_selection(
+            {
+                "double_mode": self.double_mode_enabled.get(),
+                "limit_to_eight": True,
+                "on_time": True,
+                "delay": "0",
+                "comment": "",
+                "sections": {},
+                "penalties": [],
+                "rewards": [],
+            }
+        )
+        self.status_var.set("Все поля сброшены к значениям по умолчанию.")
 
     def create_criteria_tab(self):
         self.criteria_scores = {}
+        # (задание, "base" | "extended") -> (фрейм, [(Section, данные виджетов)])
+        self.criteria_widgets = {}
+        self.visible_criteria_frames = []
 
         canvas = tk.Canvas(self.criteria_frame)
         scrollbar = ttk.Scrollbar(
@@ -465,6 +656,19 @@ class EvaluationApp:
             self.load_criteria_for_homework(self.current_homework)
 
     def create_penalty_tab(self):
+        # Около 70 флажков штрафов и поощрений создаются при первом открытии
+        # вкладки (или первом формировании листа), а не при запуске
+        self.penalty_tab_built = False
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed, add="+")
+
+    def _on_tab_changed(self, event):
+        if self.notebook.select() == str(self.penalty_frame):
+            self.ensure_penalty_tab()
+
+    def ensure_penalty_tab(self):
+        if self.penalty_tab_built:
+            return
+        self.penalty_tab_built = True
         canvas = tk.Canvas(self.penalty_frame)
         scrollbar = ttk.Scrollbar(
             self.penalty_frame, orient="vertical", command=canvas.yview
@@ -495,13 +699,14 @@ class EvaluationApp:
 
         # Создаем штрафы и поощрения из JSON-файла
         self.create_penalties_and_rewards_from_json()
+        # Флажок «Сдано вовремя» мог быть снят до построения вкладки
+        self._on_on_time_toggle()
 
     def load_criteria_for_homework(self, homework_name):
         self.current_homework = homework_name
-        sections = self.criteria_data.get("sections", {})
         self.current_criteria_source = None
-        if homework_name and homework_name in sections:
-            self.current_criteria_source = sections[homework_name]
+        if homework_name and homework_name in self.criteria.homeworks:
+            self.current_criteria_source = self.criteria.homeworks[homework_name]
         elif homework_name:
             tk.messagebox.showerror(
                 "Ошибка", f"Критерии для '{homework_name}' не найдены."
@@ -510,107 +715,131 @@ class EvaluationApp:
 
     def _get_current_criteria_list(self):
         source = getattr(self, "current_criteria_source", None)
-        if isinstance(source, dict):
-            base_sections = source.get("base", [])
-            extended_sections = source.get("extended", [])
-            use_extended = hasattr(self, "limit_to_eight") and not self.limit_to_eight.get()
-            return list(base_sections) + (list(extended_sections) if use_extended else [])
-        if isinstance(source, list):
-            return source
-        return []
+        if source is None:
+            self.current_sections = ()
+            return []
+        limit_to_eight = not hasattr(self, "limit_to_eight") or self.limit_to_eight.get()
+        self.current_sections = source.sections(limit_to_eight)
+        return source.section_dicts(limit_to_eight)
 
-    def _render_current_criteria(self):
-        if not hasattr(self, "criteria_inner_frame"):
-            return
-        for widget in self.criteria_inner_frame.winfo_children():
-            widget.destroy()
-        self.criteria_scores = {}
-        self.section_max_scores = {}
-        self.current_criteria = self._get_current_criteria_list()
-        if not self.current_criteria:
-            return
-        self.create_criteria()
-        self.set_criteria_to_max()
-
-    def create_criteria(self):
-        for section in self.current_criteria:
-            title = section.get("title", "")
-            section_type = section.get("type", "")
-            max_score = float(section.get("max_score", 0))
-            self.section_max_scores[title] = max_score
-            options = section.get("options", [])
-
-            section_frame = ttk.Labelframe(self.criteria_inner_frame, text=title)
-            section_frame.pack(fill="x", padx=10, pady=5)
-
-            vars_list = []
-
-            if section_type == "radio_with_subchecks":
-                # Используем DoubleVar для корректной работы с дробными значениями
-                initial_score = float(options[0].get("score", 0)) if options else 0.0
-                var = tk.DoubleVar(value=initial_score)
-
-                for option in options:
-                    score = float(option.get("score", 0.0))
-                    text = option.get("text", "")
-                    suboptions = option.get("suboptions", [])
-
-                    rb = ttk.Radiobutton(
-                        section_frame,
-                        text=text,
-                        variable=var,
-                        value=score,
-                        command=lambda opt=option, var_main=var, opts=options: self.radiobutton_callback(
-                            opt, var_main, opts
-                        ),
-                    )
-                    rb.pack(anchor="w")
-                    vars_list.append((var, score))
-
-                    if suboptions:
-                        sub_frame = ttk.Frame(section_frame)
-                        sub_frame.pack(anchor="w", padx=20)
-
-                        option["suboption_vars"] = []
-                        for subtext in suboptions:
-                            var_cb = tk.BooleanVar()
-                            cb = ttk.Checkbutton(
-                                sub_frame,
-                                text=subtext,
-                                variable=var_cb,
-                                command=lambda v_cb=var_cb, s=score, var_main=var: self.checkbox_callback(
-                                    v_cb, s, var_main
-                                ),
-                            )
-                            cb.pack(anchor="w")
-                            option["suboption_vars"].append(var_cb)
-                            vars_list.append((var_cb, 0.0))  # 0, так как учитываем их через вычитание
-
-                self.criteria_scores[title] = {
-                    "type": section_type,
-                    "vars": vars_list,
-                    "options": options,
-                    "main_var": var,
-                }
+    def _render_current_criteria(self, set_max=True):
+        if not hasattr(self, "criteria_inner_frame"):
+            return
+        self.ui_stats["criteria_renders"] += 1
+        # Виджеты каждого задания строятся один раз; здесь они только
+        # скрываются/показываются, а значения переменных сбрасываются
+        for frame in self.visible_criteria_frames:
+            frame.pack_forget()
+        self.visible_criteria_frames = []
+        self.criteria_scores = {}
+        self.section_max_scores = {}
+        self.current_criteria = self._get_current_criteria_list()
+        if not self.current_criteria:
+            return
+        homework = self.current_criteria_source
+        parts = ("base",) if len(self.current_sections) == len(homework.base) else ("base", "extended")
+        for part in parts:
+            frame, entries = self._get_criteria_widgets(homework, part)
+            if not entries:
+                continue
+            frame.pack(fill="x")
+            self.visible_criteria_frames.append(frame)
+            for section, data in entries:
+                if data is not None:
+                    self.criteria_scores[section.title] = data
+                self.section_max_scores[section.title] = section.max_score
+        if set_max:
+            self.set_criteria_to_max()
+
+    def _get_criteria_widgets(self, homework, part):
+        key = (homework.name, part)
+        cached = self.criteria_widgets.get(key)
+        if cached is None:
+            frame = ttk.Frame(self.criteria_inner_frame)
+            sections = homework.base if part == "base" else homework.extended
+            self.ui_stats["section_widgets_built"] += len(sections)
+            entries = [(section, self.create_criteria(frame, section)) for section in sections]
+            cached = self.criteria_widgets[key] = (frame, entries)
+        return cached
+
+    def create_criteria(self, parent, compiled):
+        title = compiled.title
+        section_type = compiled.type
+        options = compiled.raw.get("options", [])
+
+        section_frame = ttk.Labelframe(parent, text=title)
+        section_frame.pack(fill="x", padx=10, pady=5)
+
+        vars_list = []
+
+        if section_type == "radio_with_subchecks":
+            # Используем DoubleVar для корректной работы с дробными значениями
+            initial_score = compiled.options[0].score if options else 0.0
+            var = tk.DoubleVar(value=initial_score)
+
+            for option, compiled_option in zip(options, compiled.options):
+                score = compiled_option.score
+                text = compiled_option.text
+                suboptions = compiled_option.suboptions
+
+                rb = ttk.Radiobutton(
+                    section_frame,
+                    text=text,
+                    variable=var,
+                    value=score,
+                    command=lambda opt=option, var_main=var, opts=options: self.radiobutton_callback(
+                        opt, var_main, opts
+                    ),
+                )
+                rb.pack(anchor="w")
+                vars_list.append((var, score))
+
+                if suboptions:
+                    sub_frame = ttk.Frame(section_frame)
+                    sub_frame.pack(anchor="w", padx=20)
+
+                    option["suboption_vars"] = []
+                    for subtext in suboptions:
+                        var_cb = tk.BooleanVar()
+                        cb = ttk.Checkbutton(
+                            sub_frame,
+                            text=subtext,
+                            variable=var_cb,
+                            command=lambda v_cb=var_cb, s=score, var_main=var: self.checkbox_callback(
+                                v_cb, s, var_main
+                            ),
+                        )
+                        cb.pack(anchor="w")
+                        option["suboption_vars"].append(var_cb)
+                        vars_list.append((var_cb, 0.0))  # 0, так как учитываем их через вычитание
+
+            return {
+                "type": section_type,
+                "vars": vars_list,
+                "options": options,
+                "main_var": var,
+                "section": compiled,
+            }
+
+        if section_type == "checkbox":
+            for option in compiled.options:
+                score = option.score
+                text = option.text
+                var_cb = tk.BooleanVar(value=(score > 0))  # Можно оставить False, если нужно
+                cb = ttk.Checkbutton(
+                    section_frame,
+                    text=text,
+                    variable=var_cb,
+                    command=lambda: None,
+                )
+                cb.pack(anchor="w")
+                vars_list.append((var_cb, score))
 
-            elif section_type == "checkbox":
-                for option in options:
-                    score = float(option.get("score", 0.0))
-                    text = option.get("text", "")
-                    var_cb = tk.BooleanVar(value=(score > 0))  # Можно оставить False, если нужно
-                    cb = ttk.Checkbutton(
-                        section_frame,
-                        text=text,
-                        variable=var_cb,
-                        command=lambda: None,
-                    )
-                    cb.pack(anchor="w")
-                    vars_list.append((var_cb, score))
-
-                self.criteria_scores[title] = {
-                    "type": section_type,
-                    "vars": vars_list,
-                }
+            return {
+                "type": section_type,
+                "vars": vars_list,
+            }
+        return None
 
     def create_penalties_and_rewards_from_json(self):
         # Очистка предыдущих штрафов и поощрений
@@ -625,10 +854,9 @@ class EvaluationApp:
         self.penalty_vars = []
         self.penalty_texts = []
 
-        penalties = self.criteria_data.get("penalties", [])
-        for penalty in penalties:
-            text = penalty.get("text", "")
-            score = penalty.get("score", 0)
+        for penalty in self.criteria.penalties:
+            text = penalty.text
+            score = penalty.score
             var = tk.BooleanVar(value=False)
             cb = ttk.Checkbutton(self.penalty_inner_frame, text=text, variable=var)
             cb.pack(anchor="w")
@@ -636,9 +864,8 @@ class EvaluationApp:
             self.penalty_texts.append(text)
 
         # Просрочка
-        delay_info = self.criteria_data.get("delays", {})
-        delay_text = delay_info.get("text", "")
-        self.delay_penalty_per_day = delay_info.get("score_per_day", 0)
+        delay_text = self.criteria.delay_text
+        self.delay_penalty_per_day = self.criteria.delay_score_per_day
 
         delay_frame = ttk.Frame(self.penalty_inner_frame)
         delay_frame.pack(fill="x", pady=10)
@@ -654,10 +881,9 @@ class EvaluationApp:
 
         self.reward_items = []
 
-        rewards = self.criteria_data.get("rewards", [])
-        for reward in rewards:
-            text = reward.get("text", "").strip()
-            score = float(reward.get("score", 0) or 0)
+        for reward in self.criteria.rewards:
+            text = reward.text
+            score = reward.score
             var = tk.BooleanVar(value=False)
             cb = ttk.Checkbutton(self.penalty_inner_frame, text=text, variable=var)
             cb.pack(anchor="w")
@@ -676,7 +902,25 @@ class EvaluationApp:
                 for sub_var in opt["suboption_vars"]:
                     sub_var.set(False)
 
+    @contextlib.contextmanager
+    def suspended_traces(self):
+        """Блок, внутри которого обработчики trace флажков ничего не делают.
+
+        Вызывающий сам приводит зависимые элементы в порядок после блока.
+        """
+        self._trace_suspend_depth += 1
+        try:
+            yield
+        finally:
+            self._trace_suspend_depth -= 1
+
+    def _trace_suspended(self, name):
+        self.ui_stats["trace:" + name] += 1
+        return self._trace_suspend_depth > 0
+
     def _on_on_time_toggle(self, *_):
+        if self._trace_suspended("on_time"):
+            return
         if not hasattr(self, "delay_entry"):
             return
         current_delay = self.delay_entry.get().strip()
@@ -690,6 +934,8 @@ class EvaluationApp:
                 self.delay_entry.insert(0, "1")
 
     def _on_double_mode_toggle(self, *_):
+        if self._trace_suspended("double_mode"):
+            return
         if self.double_mode_enabled.get() and not self.limit_to_eight.get():
             self.limit_to_eight.set(True)
         self._sync_double_mode_controls()
@@ -705,37 +951,17 @@ class EvaluationApp:
                 self.limit_to_eight.set(True)
 
     def _on_limit_to_eight_toggle(self, *_):
+        if self._trace_suspended("limit_to_eight"):
+            return
         if not getattr(self, "current_homework", None):
             return
         if not getattr(self, "criteria_data", None):
             return
         self._render_current_criteria()
 
-    def _resolve_scoring_scale(self, section_total_max):
-        section_total_max = float(section_total_max or 0.0)
-        limit_to_eight = hasattr(self, "limit_to_eight") and self.limit_to_eight.get()
-        double_mode_on = hasattr(self, "double_mode_enabled") and self.double_mode_enabled.get()
-
-        if limit_to_eight:
-            target_cap = 8.0
-            effective_cap = min(section_total_max, target_cap) if section_total_max > 0 else target_cap
-            return max(0.0, effective_cap), target_cap, 1.0
-
-        if double_mode_on:
-            target_cap = 10.0
-            effective_cap = target_cap
-            return max(0.0, effective_cap), target_cap, 1.0
-
-        display_cap = section_total_max if section_total_max > 0 else 10.0
-        effective_cap = section_total_max
-        return max(0.0, effective_cap), display_cap, 1.0
-
     @staticmethod
     def _format_score(value):
-        if isinstance(value, (int, float)):
-            formatted = f"{float(value):.2f}".rstrip("0").rstrip(".")
-            return formatted if formatted else "0"
-        return str(value)
+        return format_score(value)
 
     def _on_delay_changed(self, event=None):
         value = self.delay_entry.get().strip() if hasattr(self, "delay_entry") else ""
@@ -789,6 +1015,17 @@ class EvaluationApp:
         self.comment_text = tk.Text(self.report_frame, height=5, width=60)
         self.comment_text.pack(pady=5)
 
+        format_frame = ttk.Frame(self.report_frame)
+        format_frame.pack(pady=5)
+        ttk.Label(format_frame, text="Формат файла:").pack(side="left")
+        ttk.Combobox(
+            format_frame,
+            textvariable=self.output_format_var,
+            values=list(OUTPUT_FORMATS),
+            state="readonly",
+            width=12,
+        ).pack(side="left", padx=5)
+
         self.generate_button = ttk.Button(
             self.report_frame,
             text="Сформировать и сохранить оценочный лист",
@@ -826,578 +1063,361 @@ class EvaluationApp:
                 for var_cb, _ in data["vars"]:
                     var_cb.set(False)
 
-        # Сбрасываем дополнительные штрафы
-        for var, _ in self.penalty_vars:
-            var.set(False)
-        self.delay_entry.delete(0, tk.END)
-        self.delay_entry.insert(0, "0")
+        # Сбрасываем дополнительные штрафы и поощрения (если вкладка уже построена)
+        if self.penalty_tab_built:
+            for var, _ in self.penalty_vars:
+                var.set(False)
+            self.delay_entry.delete(0, tk.END)
+            self.delay_entry.insert(0, "0")
 
-        # Сбрасываем поощрения
-        for reward_item in getattr(self, "reward_items", []):
-            reward_item["var"].set(False)
-        for reward_item in getattr(self, "reward_items", []):
-            reward_item["var"].set(False)
+            for reward_item in self.reward_items:
+                reward_item["var"].set(False)
 
         # Сбрасываем комментарий
         self.comment_text.delete("1.0", tk.END)
 
         self.status_var.set("Все поля сброшены к значениям по умолчанию.")
 
-    def generate_report(self, save_to_file=True):
-        if not self.student_var.get() or not self.group_var.get():
-            self.status_var.set("Пожалуйста, выберите группу и студента.")
-            return
-
-        # Рассчитываем баллы по критериям
-        section_scores = {}
-        section_comments = {}
-        section_raw_total = 0.0
-
-        for section, data in self.criteria_scores.items():
-            max_score = float(self.section_max_scores.get(section, 0.0))
-            comments = []
-            score = 0.0
-
-            if data["type"] == "radio_with_subchecks":
-                main_var = data["main_var"]
-                main_score = float(main_var.get())  # main_score теперь float
-                selected_option = None
-
-                for option in data["options"]:
-                    opt_score = float(option.get("score", 0.0))
-                    if abs(opt_score - main_score) < 1e-9:
-                        selected_option = option
-                        break
-
-                if selected_option:
-                    if "suboptions" in selected_option and selected_option["suboptions"]:
-                        num_selected_checkboxes = 0
-                        for var_cb, subtext in zip(
-                            selected_option["suboption_vars"],
-                            selected_option["suboptions"],
-                        ):
-                            if var_cb.get():
-                                num_selected_checkboxes += 1
-                                comments.append(subtext)
-
-                        deduction = abs(main_score) * num_selected_checkboxes
-                        deduction = min(deduction, max_score)
-                        score = max_score - deduction
-                    else:
-                        # Если нет субопций, score равен main_score, если он положительный,
-                        # или (max_score + main_score), если main_score отрицательный
-                        if main_score >= 0:
-                            score = main_score
-                        else:
-                            # Если main_score отрицательный, уменьшаем от max_score
-                            # Пример: max_score=10, main_score=-0.5 -> score=10 - 0.5 = 9.5
-                            score = max_score + main_score
-                else:
-                    score = 0.0
-
-            elif data["type"] == "checkbox":
-                # Суммируем баллы за выбранные чекбоксы
-                score_sum = 0.0
-                for var_cb, var_score in data["vars"]:
-                    if var_cb.get():
-                        score_sum += var_score
-                        if var_score < 0:
-                            # Можно добавить текст ошибки, если нужно
-                            pass
-                # Ограничиваем в пределах 0 и max_score
-                score = max(0.0, min(max_score, score_sum))
-
-            section_scores[section] = score
-            section_comments[section] = comments
-            section_raw_total += score
-
-        # Учёт штрафов
-        penalty_score = 0.0
-        penalty_comments = []
-        disqualified = False
-        penalty_pairs = getattr(self, "penalty_vars", [])
-        penalty_texts = getattr(self, "penalty_texts", [])
-        for (var, value), text in zip(penalty_pairs, penalty_texts):
-            val = float(value)
-            if not var.get():
-                continue
-            if val <= -1000:
-                disqualified = True
-                penalty_comments.append(text)
-            else:
-                penalty_score += val
-                penalty_comments.append(text)
-
-        # Учёт просрочки
-        delay_raw = self.delay_entry.get().strip()
-        if not delay_raw:
-            delay_days = 0
-        else:
-            try:
-                delay_days = int(delay_raw)
-            except ValueError:
-                self.status_var.set("Количество дней просрочки должно быть целым числом.")
-                return
-            if delay_days < 0:
-                self.status_var.set("Количество дней просрочки не может быть отрицательным.")
-                return
-
-        effective_delay_days = delay_days
-        if not self.on_time.get() and effective_delay_days == 0:
-            effective_delay_days = 1
-
-        forced_zero_due_to_delay = False
-        delay_penalty_comment_index = None
-        if effective_delay_days > 0:
-            forced_zero_due_to_delay = True
-            delay_penalty_comment_index = len(penalty_comments)
-            penalty_comments.append("")
-
-        comment_text = self.comment_text.get("1.0", tk.END).strip()
-
-        reward_comments = []
-        reward_bonus = 0.0
-        for reward_item in getattr(self, "reward_items", []):
-            if reward_item["var"].get():
-                reward_comments.append(reward_item["text"])
-                reward_bonus += float(reward_item["score"])
-
-        if disqualified:
-            total_score = 0.0
-            penalty_score = 0.0
-            reward_bonus = 0.0
-
-        max_total_score = sum(self.section_max_scores.values()) or 0.0
-        effective_cap, _display_cap, scaling_factor = self._resolve_scoring_scale(max_total_score)
-        result_display_cap = 10.0  # Всегда показываем итог как «… из 10»
-
-        if scaling_factor != 1.0:
-            section_scores = {
-                key: value * scaling_factor for key, value in section_scores.items()
-            }
-            penalty_score *= scaling_factor
-            reward_bonus *= scaling_factor
-        total_score = sum(section_scores.values())
-        limit_to_eight_active = hasattr(self, "limit_to_eight") and self.limit_to_eight.get()
-        double_mode_active = hasattr(self, "double_mode_enabled") and self.double_mode_enabled.get()
-
-        if limit_to_eight_active:
-            base_cap = effective_cap if effective_cap > 0 else 8.0
-            reference_max = max_total_score if max_total_score > 0 else base_cap
-            lost_points = max(0.0, reference_max - total_score)
-            adjusted_total = base_cap - lost_points + penalty_score + reward_bonus
-            final_score = max(0.0, min(base_cap, adjusted_total))
-        elif double_mode_active:
-            base_cap = effective_cap if effective_cap > 0 else 10.0
-            reference_max = max_total_score if max_total_score > 0 else base_cap
-            scaling_ratio = (base_cap / reference_max) if reference_max > 0 else 1.0
-            lost_points = max(0.0, reference_max - total_score)
-            adjusted_total = base_cap - (lost_points * scaling_ratio) + penalty_score + reward_bonus
-            final_score = max(0.0, min(base_cap, adjusted_total))
-        elif effective_cap > 0:
-            base_total = total_score + penalty_score + reward_bonus
-            final_score = max(0.0, min(effective_cap, base_total))
-        else:
-            final_score = max(0.0, total_score + penalty_score + reward_bonus)
+    def apply_selection(self, selection):
+        """Выставляет переменные Tk по выбору в формате scoring (обратно collect_selection).
 
-        if forced_zero_due_to_delay:
-            final_score = 0.0
+        Разделы, которых нет в выборе, ставятся на максимум. Обработчики trace
+        на это время отключены: список разделов перестраивается не больше
+        одного раза и только если изменился режим «вариант на 8», а флажки
+        двойного режима сверяются один раз в конце.
+        """
+        double_mode = bool(selection.get("double_mode", False))
+        # Без двойного режима флажок «вариант на 8» всегда установлен
+        limit_to_eight = bool(selection.get("limit_to_eight", True)) or not double_mode
+        on_time = bool(selection.get("on_time", True))
+        delay = str(selection.get("delay", "0") or "0")
+        if (
+            selection.get("penalties")
+            or selection.get("rewards")
+            or not on_time
+            or delay.strip() != "0"
+        ):
+            self.ensure_penalty_tab()
 
-        if delay_penalty_comment_index is not None and 0 <= delay_penalty_comment_index < len(penalty_comments):
-            penalty_comments[delay_penalty_comment_index] = (
-                f"Работа сдана с просрочкой на {effective_delay_days} дн. Итоговая оценка 0 согласно правилам."
-            )
+        with self.suspended_traces():
+            self.double_mode_enabled.set(double_mode)
+            self.limit_to_eight.set(limit_to_eight)
+            homework = self.current_criteria_source
+            if homework is not None and self.current_sections != homework.sections(limit_to_eight):
+                self._render_current_criteria(set_max=False)
+            self._apply_sections(selection.get("sections", {}))
 
-        delay_days = effective_delay_days
+            if self.penalty_tab_built:
+                penalties = set(selection.get("penalties", []))
+                for index, (var, _) in enumerate(self.penalty_vars):
+                    var.set(index in penalties)
+                rewards = set(selection.get("rewards", []))
+                for index, reward_item in enumerate(self.reward_items):
+                    reward_item["var"].set(index in rewards)
+                self.delay_entry.delete(0, tk.END)
+                self.delay_entry.insert(0, delay)
+            self.on_time.set(on_time)
+            self.comment_text.delete("1.0", tk.END)
+            self.comment_text.insert("1.0", selection.get("comment", ""))
+        self._sync_double_mode_controls()
 
-        if hasattr(self, "status_var"):
-            self.status_var.set(
-                f"Рассчитан итог: {self._format_score(final_score)} из {self._format_score(result_display_cap)}."
-            )
+    def _apply_sections(self, section_states):
+        for title, data in self.criteria_scores.items():
+            state = section_states.get(title)
+            if state is None:
+                self._set_section_to_max(data)
+            elif data["type"] == "radio_with_subchecks":
+                data["main_var"].set(state.get("score", 0.0))
+                checked = {tuple(pair) for pair in state.get("suboptions", [])}
+                for option_index, option in enumerate(data["options"]):
+                    for sub_index, var_cb in enumerate(option.get("suboption_vars", [])):
+                        var_cb.set((option_index, sub_index) in checked)
+            elif data["type"] == "checkbox":
+                checked = set(state.get("checked", []))
+                for index, (var_cb, _) in enumerate(data["vars"]):
+                    var_cb.set(index in checked)
 
-        # Генерация изображения с отчётом
-        self.create_image(
-            section_scores,
-            section_comments,
-            penalty_comments,
-            final_score,
-            result_display_cap,
-            delay_days,
-            comment_text,
-            reward_comments,
-        )
-
-        # Сохранение изображения
-        if save_to_file:
-            self.save_image()
-
-
-    def create_image(
-        self,
-        section_scores,
-        section_comments,
-        penalty_comments,
-        final_score,
-        max_score_cap,
-        delay_days,
-        comment,
-        reward_comments,
-    ):
-        # Настройки изображения
-        img_width = 1200  # Увеличено разрешение
-        img_height = 1500  # Увеличено высоту для размещения поощрений
-        background_color = (255, 255, 255)
-        text_color = (0, 0, 0)
-
-        # Определение путей к шрифтам (предполагается, что шрифты находятся в той же директории, что и скрипт)
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        gilroy_black_path = os.path.join(base_path, "gilroy-black.ttf")
-        gilroy_bold_path = os.path.join(base_path, "gilroy-bold.ttf")
-        gilroy_regular_path = os.path.join(base_path, "gilroy-regular.ttf")
-        gilroy_medium_path = os.path.join(base_path, "gilroy-medium.ttf")
-        segoe_emoji_path = os.path.join(base_path, "segoe-ui-emoji.ttf")
-
-        # Загрузка шрифтов
-        try:
-            title_font = ImageFont.truetype(gilroy_black_path, 36)
-            header_font = ImageFont.truetype(gilroy_bold_path, 24)
-            text_font = ImageFont.truetype(gilroy_regular_path, 18)
-            emoji_font = ImageFont.truetype(segoe_emoji_path, 18)
-        except IOError as e:
-            tk.messagebox.showerror(
-                "Ошибка",
-                f"Не удалось загрузить шрифты: {e}",
-            )
-            return
+    def collect_selection(self):
+        """Снимок состояния оценивания в формате scoring (см. scoring.py).
 
-        # Создание нового изображения
-        img = Image.new("RGB", (img_width, img_height), color=background_color)
-        draw = ImageDraw.Draw(img)
-        y_position = 20
-
-        # Импорт внутри метода, чтобы избежать глобальных импортов
-        import emoji
-
-        def split_text_and_emojis(text):
-            """
-            Разделяет текст на сегменты: обычный текст и эмодзи.
-            Возвращает список кортежей вида ('text', текст) или ('emoji', эмодзи).
-            """
-            emojis = emoji.emoji_list(text)
-            segments = []
-            last_end = 0
-            for em in emojis:
-                start, end = em["match_start"], em["match_end"]
-                if start > last_end:
-                    # Добавляем текст перед эмодзи
-                    segments.append(("text", text[last_end:start]))
-                # Добавляем эмодзи
-                segments.append(("emoji", text[start:end]))
-                last_end = end
-            if last_end < len(text):
-                # Добавляем оставшийся текст
-                segments.append(("text", text[last_end:]))
-            return segments
-
-        def emoji_to_codepoints(emoji_char):
-            """
-            Преобразует эмодзи в строку кодовых точек, разделённых дефисами.
-            Например, 😀 -> '1f600'
-            """
-            codepoints = [f"{ord(ch):x}" for ch in emoji_char]
-            return "-".join(codepoints)
-
-        def draw_text_with_emojis(
-            draw, img, x, y, text, font_regular, font_emoji, fill
-        ):
-            """
-            Рисует текст с эмодзи на изображении с использованием объекта draw.
-            """
-            current_x = x
-            current_y = y
-            max_height = 0
-
-            segments = split_text_and_emojis(text)
-            for typ, segment in segments:
-                if typ == "text":
-                    # Рисуем текст
-                    draw.text(
-                        (current_x, current_y), segment, font=font_regular, fill=fill
-                    )
-                    bbox = font_regular.getbbox(segment)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
-                    current_x += text_width
-                    max_height = max(max_height, text_height)
-                elif typ == "emoji":
-                    codepoint_seq = emoji_to_codepoints(segment)
-                    emoji_filename = os.path.join(
-                        base_path, "emoji_images", f"{codepoint_seq}.png"
-                    )
-                    if os.path.exists(emoji_filename):
-                        try:
-                            emoji_image = Image.open(emoji_filename).convert("RGBA")
-                            # Изменяем размер эмодзи, чтобы соответствовать высоте текста
-                            # Используем метод getbbox для символа 'A' как репрезентативного
-                            text_bbox = font_regular.getbbox("A")
-                            text_height = int(1.5 * text_bbox[3] - text_bbox[1])
-                            # Используем Image.Resampling.LANCZOS для Pillow >=10
-                            if hasattr(Image, "Resampling"):
-                                resample_filter = Image.Resampling.LANCZOS
-                            else:
-                                resample_filter = Image.LANCZOS
-                            emoji_image = emoji_image.resize(
-                                (text_height, text_height), resample=resample_filter
-                            )
-                            img.paste(emoji_image, (current_x, current_y), emoji_image)
-                            current_x += (
-                                text_height  # Смещаемся вправо на ширину эмодзи
-                            )
-                            max_height = max(max_height, text_height)
-                        except Exception as e:
-                            # В случае ошибки загрузки изображения эмодзи, рисуем его как текст
-                            print(e)
-                            draw.text(
-                                (current_x, current_y),
-                                segment,
-                                font=font_regular,
-                                fill=fill,
-                            )
-                            bbox = font_regular.getbbox(segment)
-                            text_width = bbox[2] - bbox[0]
-                            text_height = bbox[3] - bbox[1]
-                            current_x += text_width
-                            max_height = max(max_height, text_height)
-                    else:
-                        # pass
-                        # # Если изображение эмодзи не найдено, рисуем его как текст
-                        draw.text(
-                            (current_x, current_y),
-                            segment,
-                            font=font_emoji,
-                            fill=fill,
-                        )
-                        bbox = font_emoji.getbbox(segment)
-                        text_width = bbox[2] - bbox[0]
-                        text_height = bbox[3] - bbox[1]
-                        current_x += text_width
-                        max_height = max(max_height, text_height)
-            return current_y + max_height + 5
-
-        # Заголовок
-        header_text = "Оценочный лист"
-        # Центрируем заголовок
-        header_width = (
-            title_font.getbbox(header_text)[2] - title_font.getbbox(header_text)[0]
-        )
-        header_x = (img_width - header_width) // 2
-        y_position = draw_text_with_emojis(
-            draw,
-            img,
-            header_x,
-            y_position,
-            header_text,
-            title_font,
-            emoji_font,
-            text_color,
-        )
-        y_position += 20  # Добавляем отступ после заголовка
-
-        # Информация о студенте
-        student_info = f"Студент: {self.student_var.get()}    Группа: {self.group_var.get()}    Вариант: {self.variant_entry.get()}"
-        y_position = draw_text_with_emojis(
-            draw, img, 50, y_position, student_info, text_font, emoji_font, text_color
-        )
-        y_position += 10
-
-        if (
-            hasattr(self, "double_mode_enabled")
-            and self.double_mode_enabled.get()
-            and hasattr(self, "limit_to_eight")
-        ):
-            cap_text = self._format_score(8 if self.limit_to_eight.get() else 10)
-            variant_text = f"Вариант работы: максимум {cap_text} баллов"
-            y_position = draw_text_with_emojis(
-                draw, img, 50, y_position, variant_text, text_font, emoji_font, text_color
-            )
-            y_position += 10
-
-        # Информация о сдаче
-        date_info = f"Сдано вовремя: {'Да' if self.on_time.get() else 'Нет'}    Дней просрочки: {delay_days}"
-        y_position = draw_text_with_emojis(
-            draw, img, 50, y_position, date_info, text_font, emoji_font, text_color
-        )
-        y_position += 20
+        Вкладку штрафов не строит: пока её нет, штрафов и поощрений нет, а
+        просрочка такая, какой её выставит вкладка при построении.
+        """
+        sections = {}
+        for section, data in self.criteria_scores.items():
+            if data["type"] == "radio_with_subchecks":
+                checked_suboptions = []
+                for option_index, option in enumerate(data["options"]):
+                    for sub_index, var_cb in enumerate(option.get("suboption_vars", [])):
+                        if var_cb.get():
+                            checked_suboptions.append([option_index, sub_index])
+                sections[section] = {
+                    "score": float(data["main_var"].get()),
+                    "suboptions": checked_suboptions,
+                }
+            elif data["type"] == "checkbox":
+                sections[section] = {
+                    "checked": [
+                        index
+                        for index, (var_cb, _) in enumerate(data["vars"])
+                        if var_cb.get()
+                    ]
+                }
 
-        # Критерии
-        for section, score in section_scores.items():
-            y_position = draw_text_with_emojis(
-                draw, img, 50, y_position, section, header_font, emoji_font, text_color
-            )
-            y_position += 10
-            score_text = f"Баллы: {self._format_score(score)}"
-            y_position = draw_text_with_emojis(
-                draw, img, 70, y_position, score_text, text_font, emoji_font, text_color
-            )
-            y_position += 5
-            comments = section_comments.get(section, [])
-            for comment_text in comments:
-                comment_line = f"- {comment_text}"
-                y_position = draw_text_with_emojis(
-                    draw,
-                    img,
-                    90,
-                    y_position,
-                    comment_line,
-                    text_font,
-                    emoji_font,
-                    text_color,
-                )
-                y_position += 5
-            y_position += 10
+        return {
+            "homework": self.hw_name_var.get(),
+            "student": self.student_var.get(),
+            "group": self.group_var.get(),
+            "variant": self.variant_entry.get(),
+            "on_time": self.on_time.get(),
+            "delay": (
+                self.delay_entry.get().strip()
+                if self.penalty_tab_built
+                else ("0" if self.on_time.get() else "1")
+            ),
+            "comment": self.comment_text.get("1.0", tk.END).strip(),
+            "double_mode": hasattr(self, "double_mode_enabled") and self.double_mode_enabled.get(),
+            "limit_to_eight": hasattr(self, "limit_to_eight") and self.limit_to_eight.get(),
+            "sections": sections,
+            "penalties": [
+                index
+                for index, (var, _) in enumerate(getattr(self, "penalty_vars", []))
+                if var.get()
+            ],
+            "rewards": [
+                index
+                for index, reward_item in enumerate(getattr(self, "reward_items", []))
+                if reward_item["var"].get()
+            ],
+        }
+
+    def generate_report(self, save_to_file=True, on_ready=None):
+        """Считает оценку и отдаёт отрисовку и сохранение фоновому потоку.
+
+        Все данные для листа снимаются здесь, в потоке Tk, поэтому можно сразу
+        переходить к следующему студенту. on_ready(изображение) вызывается,
+        когда лист готов.
+        """
+        if not self.student_var.get() or not self.group_var.get():
+            self.status_var.set("Пожалуйста, выберите группу и студента.")
+            return
 
-        # Штрафы
-        y_position = draw_text_with_emojis(
-            draw,
-            img,
-            50,
-            y_position,
-            "Дополнительные штрафы:",
-            header_font,
-            emoji_font,
-            text_color,
+        # Рассчитываем баллы по критериям, штрафам и поощрениям
+        selection = self.collect_selection()
+        # Этап листа начинается здесь и завершается в фоновом потоке
+        trace = tracing.start(
+            "sheet", homework=self.hw_name_var.get(), student=self.student_var.get()
         )
-        y_position += 10
-        if penalty_comments:
-            for comment_text in penalty_comments:
-                comment_line = f"- {comment_text}"
-                y_position = draw_text_with_emojis(
-                    draw,
-                    img,
-                    70,
-                    y_position,
-                    comment_line,
-                    text_font,
-                    emoji_font,
-                    text_color,
+        try:
+            with tracing.resume(trace), tracing.span("scoring"):
+                report = compute_report(
+                    self.current_criteria,
+                    selection,
+                    self.criteria_data.get("penalties", []),
+                    self.criteria_data.get("rewards", []),
                 )
-                y_position += 5
-        else:
-            y_position = draw_text_with_emojis(
-                draw, img, 70, y_position, "Нет", text_font, emoji_font, text_color
-            )
-            y_position += 5
-        y_position += 10
+        except ScoringError as e:
+            if trace is not None:
+                trace.finish()
+            self.status_var.set(str(e))
+            return
 
-        # Поощрения
-        y_position = draw_text_with_emojis(
-            draw,
-            img,
-            50,
-            y_position,
-            "И ещё кое-что:",
-            header_font,
-            emoji_font,
-            text_color,
-        )
-        y_position += 10
-        if reward_comments:
-            for reward in reward_comments:
-                y_position = draw_text_with_emojis(
-                    draw, img, 70, y_position, reward, text_font, emoji_font, text_color
-                )
-                y_position += 5
-        else:
-            y_position = draw_text_with_emojis(
-                draw, img, 70, y_position, "Нет", text_font, emoji_font, text_color
+        if hasattr(self, "status_var"):
+            self.status_var.set(
+                f"Рассчитан итог: {self._format_score(report['final_score'])} "
+                f"из {self._format_score(report['max_score_cap'])}."
             )
-            y_position += 5
-        y_position += 10
 
-        # Разделительная линия
-        draw.line((50, y_position, img_width - 50, y_position), fill=text_color)
-        y_position += 10
-
-        # Итоговая оценка
-        final_score_text = f"Итоговая оценка: {self._format_score(final_score)} из {self._format_score(max_score_cap)}"
-        y_position = draw_text_with_emojis(
-            draw,
-            img,
-            50,
-            y_position,
-            final_score_text,
-            header_font,
-            emoji_font,
-            text_color,
+        target = self._save_target() if save_to_file else None
+        homework = self.current_criteria_source
+        memo_key = self._render_memo_key(selection)
+        draft = (self._current_draft_key(), draft_state(selection))
+        key = None
+        if target is not None and homework is not None:
+            hw_name, student_name, output_format = target
+            filename = sheet_path(hw_name, student_name, fmt=output_format)
+            key = render_key(selection, homework.version, output_format)
+            if on_ready is None and self._render_index().is_current(filename, key):
+                # Файл уже сохранён ровно с этими оценками — рисовать нечего,
+                # оценка на всякий случай ещё раз записывается в базу
+                if trace is not None:
+                    trace.finish()
+                self._forget_draft(draft)
+                self.status_var.set(f"Оценочный лист не изменился: '{filename}'.")
+                if self.render_worker.submit(
+                    lambda: self._record_grade(selection, report, homework),
+                    on_done=self._on_grade_recorded,
+                ):
+                    self._schedule_render_poll()
+                return
+        submitted = self.render_worker.submit(
+            lambda: self._render_sheet(report, homework, target, key, trace, selection),
+            on_done=lambda result: self._on_sheet_rendered(
+                result, on_ready, memo_key, trace, draft
+            ),
+            on_error=self._on_render_error,
         )
-        y_position += 20
-
-        # Комментарий
-        if comment:
-            y_position = draw_text_with_emojis(
-                draw,
-                img,
-                50,
-                y_position,
-                "Комментарий:",
-                header_font,
-                emoji_font,
-                text_color,
-            )
-            y_position += 10
-            # Разделяем комментарий на строки
-            lines = comment.split("\n")
-            for line in lines:
-                y_position = draw_text_with_emojis(
-                    draw, img, 70, y_position, line, text_font, emoji_font, text_color
-                )
-                y_position += 5
-
-        self.generated_image = img
+        if not submitted:
+            self.status_var.set("Предыдущие листы ещё сохраняются, повторите через секунду.")
+            return
+        self._schedule_render_poll()
 
-    def save_image(self):
-        # Создание папки с названием домашней работы
+    def _save_target(self):
+        """(домашняя работа, ФИО, формат) для сохранения или None с сообщением в строке состояния."""
         hw_name = self.hw_name_var.get()
         if not hw_name:
             self.status_var.set("Пожалуйста, выберите название домашней работы.")
-            return
+            return None
         # Проверка, что критерии загружены
         if not self.current_criteria:
             self.status_var.set("Пожалуйста, выберите домашнее задание.")
-            return
+            return None
+        return hw_name, self.student_var.get(), self.output_format_var.get()
 
-        if not os.path.exists(SUB_PATH):
-            os.makedirs(SUB_PATH)
-        hw_name = os.path.join(SUB_PATH, hw_name)
-        if not os.path.exists(hw_name):
-            os.makedirs(hw_name)
-        # Сохранение изображения с именем студента
-        student_name = self.student_var.get().replace(" ", "_")
-        filename = os.path.join(hw_name, f"{student_name}.png")
-        self.generated_image.save(filename)
-        self.status_var.set(f"Оценочный лист сохранен как '{filename}'.")
+    def _record_grade(self, selection, report, homework):
+        """Выполняется в фоновом потоке; возвращает текст ошибки или None."""
+        if homework is None:
+            return None
+        try:
+            if self.worker_gradebook is None:
+                self.worker_gradebook = Gradebook(check_same_thread=False)
+            self.worker_gradebook.upsert(selection, report, homework.version)
+        except sqlite3.Error as e:
+            return f"Не удалось записать оценку в базу: {e}"
+        return None
+
+    def _on_grade_recorded(self, error):
+        if error is not None:
+            self.status_var.set(error)
+
+    def _render_index(self):
+        if self.render_index is None:
+            self.render_index = RenderIndex()
+        return self.render_index
 
-    def copy_to_clipboard(self):
-        # Генерация отчета, если он еще не создан
-        self.generate_report(save_to_file=False)
-        # Копирование изображения в буфер обмена
-        if sys.platform.startswith("win"):
-            output = io.BytesIO()
-            self.generated_image.convert("RGB").save(output, "BMP")
-            data = output.getvalue()[14:]
-            output.close()
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardData(win32clipboard.CF_DIB, data)
-            win32clipboard.CloseClipboard()
-            self.status_var.set("Оценочный лист скопирован в буфер обмена.")
-        else:
-            self.status_var.set(
-                "Копирование изображения в буфер обмена поддерживается только на Windows."
+    def _render_sheet(self, report, homework, target, key=None, trace=None, selection=None):
+        """Выполняется в фоновом потоке: не обращается к Tk.
+
+        Оценка записывается в базу только после того, как лист нарисован
+        (и сохранён); возвращается (макет, изображение, файл, ошибка базы).
+        """
+        try:
+            layout, image, filename = self._draw_and_save(report, homework, target, key, trace)
+            grade_error = None
+            if selection is not None:
+                grade_error = self._record_grade(selection, report, homework)
+            return layout, image, filename, grade_error
+        finally:
+            if trace is not None:
+                trace.finish()
+
+    def _draw_and_save(self, report, homework, target, key, trace):
+        with tracing.resume(trace):
+            with tracing.span("import"):
+                from rendering import layout_report
+
+            # Проход измерения: макет можно перерисовать в другом масштабе
+            with tracing.span("layout"):
+                layout = layout_report(report)
+            # Проход отрисовки на холст ровно под высоту содержимого
+            template = self._sheet_template(homework)
+            with tracing.span("draw"):
+                image = layout.draw(template=template)
+            filename = None
+            if target is not None:
+                hw_name, student_name, output_format = target
+                filename = sheet_path(hw_name, student_name, fmt=output_format)
+                save_sheet(image, filename, output_format)
+                if key is not None:
+                    self.render_index.record(filename, key)
+                    self.render_index.save()
+        return layout, image, filename
+
+    def _sheet_template(self, homework):
+        # Шаблоны создаются и используются только в фоновом потоке
+        from rendering import sheet_template
+
+        if homework is None:
+            return None
+        template = self.sheet_templates.get(homework.name)
+        if template is None:
+            template = self.sheet_templates[homework.name] = sheet_template(
+                homework.section_dicts(False),
+                self.criteria_data.get("penalties", []),
+                self.criteria_data.get("rewards", []),
             )
+        return template
+
+    def _render_memo_key(self, selection):
+        homework = self.current_criteria_source
+        return render_key(selection, homework.version if homework is not None else "")
+
+    def _on_sheet_rendered(self, result, on_ready, memo_key=None, trace=None, draft=None):
+        self.generated_layout, self.generated_image, filename, grade_error = result
+        self._last_render = (memo_key, self.generated_image)
+        if filename is not None:
+            self.status_var.set(f"Оценочный лист сохранен как '{filename}'.")
+            self._forget_draft(draft)
+        if on_ready is not None:
+            on_ready(self.generated_image)
+        self._on_grade_recorded(grade_error)
+        if trace is not None:
+            self.status_var.set(f"{self.status_var.get()} {tracing.summary(trace.record)}".strip())
+
+    def _forget_draft(self, draft):
+        """Удаляет черновик студента, лист которого сохранён: оценивание есть в базе."""
+        if draft is not None and draft[0] is not None:
+            self.drafts.discard(draft[0])
+            self._saved_draft = draft
+
+    def _on_render_error(self, error):
+        tk.messagebox.showerror("Ошибка", f"Не удалось сформировать оценочный лист: {error}")
+
+    def _schedule_render_poll(self):
+        if not self._render_poll_scheduled:
+            self._render_poll_scheduled = True
+            self.master.after(50, self._poll_render_worker)
+
+    def _poll_render_worker(self):
+        self._render_poll_scheduled = False
+        if self.render_worker.poll():
+            self._schedule_render_poll()
+
+    def copy_to_clipboard(self):
+        # Если оценки не менялись с последней отрисовки (например, лист только
+        # что сохранён), копируется готовое изображение без пересчёта
+        if self._last_render is not None and self.student_var.get() and self.group_var.get():
+            memo_key, image = self._last_render
+            if memo_key == self._render_memo_key(self.collect_selection()):
+                self._copy_image_to_clipboard(image)
+                return
+        # Иначе лист формируется заново и копируется, когда будет готов
+        self.generate_report(save_to_file=False, on_ready=self._copy_image_to_clipboard)
+
+    def _copy_image_to_clipboard(self, image):
+        try:
+            copy_image(image)
+        except ClipboardError as e:
+            self.status_var.set(str(e))
+            return
+        self.status_var.set("Оценочный лист скопирован в буфер обмена.")
 
 
 if __name__ == "__main__":
+    startup_timer.mark("импорт модулей")
+    trace_path = tracing.trace_path_from_argv(sys.argv[1:])
+    if trace_path is not None:
+        tracing.configure(trace_path)
     root = tk.Tk()
+    startup_timer.mark("создание окна Tk")
     app = EvaluationApp(root)
-    root.mainloop()
+    startup_timer.mark("вкладки штрафов и отчёта")
+    if startup_timing_enabled():
+        root.update()
+        startup_timer.mark("первая отрисовка окна")
+        startup_timer.report()
+    if "--navigation-benchmark" in sys.argv[1:]:
+        run_navigation_benchmark(app)
+        root.destroy()
+    else:
+        root.mainloop()
@@ -0,0 +1,272 @@
+"""Куда и как сохраняются готовые оценочные листы.
+
+Листы — чёрный текст на белом с редкими эмодзи, поэтому кроме обычного PNG
+доступны PNG с адаптивной палитрой и WebP без потерь. Сравнить размер и
+время кодирования на уже сохранённых листах:
+
+    python output.py created_files/ДЗ_3 [--levels 1,6,9] [--limit 50]
+
+SheetArchive пишет листы целой домашней работы сразу в один ZIP или TAR,
+без промежуточных файлов, и добавляет manifest.csv с итогами.
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import tarfile
+import time
+import zipfile
+
+from scoring import format_score
+import tracing
+
+SUB_PATH = "created_files"
+
+# Формат -> (расширение файла, описание)
+OUTPUT_FORMATS = {
+    "png": (".png", "PNG, полноцветный"),
+    "png-palette": (".png", "PNG с адаптивной палитрой (256 цветов)"),
+    "webp": (".webp", "WebP без потерь"),
+}
+DEFAULT_FORMAT = "png"
+# Уровень сжатия zlib для PNG (0 — без сжатия, 9 — максимальное); 6 — как у Pillow
+DEFAULT_PNG_LEVEL = 6
+
+
+def check_format(fmt, compress_level=DEFAULT_PNG_LEVEL):
+    """ValueError с понятным текстом, если формат или уровень сжатия неверны."""
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Неизвестный формат '{fmt}'. Доступны: {', '.join(OUTPUT_FORMATS)}."
+        )
+    if not 0 <= compress_level <= 9:
+        raise ValueError("Уровень сжатия PNG должен быть от 0 до 9.")
+
+
+def sheet_filename(student_name, fmt=DEFAULT_FORMAT):
+    extension = OUTPUT_FORMATS[fmt][0]
+    return f"{student_name.replace(' ', '_')}{extension}"
+
+
+def sheet_path(hw_name, student_name, base_dir=SUB_PATH, fmt=DEFAULT_FORMAT):
+    """Путь created_files/<домашняя работа>/<ФИО>.<расширение>; папки создаются при необходимости."""
+    hw_dir = os.path.join(base_dir, hw_name)
+    os.makedirs(hw_dir, exist_ok=True)
+    return os.path.join(hw_dir, sheet_filename(student_name, fmt))
+
+
+def _encoder_args(image, fmt, compress_level):
+    """(изображение, формат Pillow, параметры save) для выбранного формата."""
+    # Pillow импортируется лениво: модуль нужен интерфейсу уже при запуске
+    from PIL import Image
+
+    if fmt == "png":
+        return image, "PNG", {"compress_level": compress_level}
+    if fmt == "png-palette":
+        adaptive = Image.Palette.ADAPTIVE if hasattr(Image, "Palette") else Image.ADAPTIVE
+        paletted = image.convert("RGB").convert("P", palette=adaptive, colors=256)
+        return paletted, "PNG", {"compress_level": compress_level}
+    if fmt == "webp":
+        return image, "WEBP", {"lossless": True, "method": 4}
+    check_format(fmt, compress_level)
+
+
+def encode_sheet(image, fmt=DEFAULT_FORMAT, compress_level=DEFAULT_PNG_LEVEL):
+    """Кодирует лист в байты выбранного формата."""
+    with tracing.span("encode", format=fmt):
+        prepared, pillow_format, params = _encoder_args(image, fmt, compress_level)
+        buffer = io.BytesIO()
+        prepared.save(buffer, pillow_format, **params)
+        data = buffer.getvalue()
+        tracing.count("bytes_written", len(data))
+    return data
+
+
+def save_sheet(image, filename, fmt=DEFAULT_FORMAT, compress_level=DEFAULT_PNG_LEVEL):
+    # Pillow кодирует и пишет файл за один вызов, поэтому этап «save» включает кодирование
+    with tracing.span("save", format=fmt):
+        prepared, pillow_format, params = _encoder_args(image, fmt, compress_level)
+        prepared.save(filename, pillow_format, **params)
+        if tracing.enabled():
+            tracing.count("bytes_written", os.path.getsize(filename))
+    return filename
+
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+MANIFEST_FILENAME = "manifest.csv"
+MANIFEST_COLUMNS = ["ФИО", "Группа", "Вариант", "Баллы", "Максимум", "Файл"]
+
+
+def is_archive_path(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class SheetArchive:
+    """Потоковая запись листов в ZIP или TAR (по расширению файла).
+
+    Каждый лист сразу уходит в архив и в памяти не задерживается; до закрытия
+    копятся только строки манифеста. Листы уже сжаты, поэтому в ZIP они
+    кладутся без повторного сжатия.
+    """
+
+    def __init__(self, path):
+        if not is_archive_path(path):
+            raise ValueError(
+                f"Архив должен иметь расширение {', '.join(ARCHIVE_SUFFIXES)}: {path}"
+            )
+        self.path = path
+        self._manifest = []
+        self._mtime = time.time()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if path.lower().endswith(".zip"):
+            self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)
+            self._tar = None
+        else:
+            mode = "w|" if path.lower().endswith(".tar") else "w|gz"
+            self._zip = None
+            self._tar = tarfile.open(path, mode)
+
+    def add(self, name, data):
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, time.localtime(self._mtime)[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            self._zip.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(self._mtime)
+            self._tar.addfile(info, io.BytesIO(data))
+
+    def add_sheet(self, hw_name, report, data, fmt=DEFAULT_FORMAT):
+        """Кладёт лист в <домашняя работа>/<ФИО>.<расширение>; возвращает имя в архиве."""
+        name = f"{hw_name}/{sheet_filename(report['student'], fmt)}"
+        self.add(name, data)
+        self._manifest.append(
+            (
+                report["student"],
+                report["group"],
+                report["variant"],
+                report["final_score"],
+                report["max_score_cap"],
+                name,
+            )
+        )
+        return name
+
+    def close(self):
+        if self._zip is None and self._tar is None:
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+        writer.writerow(MANIFEST_COLUMNS)
+        for student, group, variant, score, max_score, name in self._manifest:
+            writer.writerow(
+                [student, group, variant, format_score(score), format_score(max_score), name]
+            )
+        # BOM, чтобы Excel открыл манифест в правильной кодировке
+        self.add(MANIFEST_FILENAME, ("\ufeff" + buffer.getvalue()).encode("utf-8"))
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        else:
+            self._tar.close()
+            self._tar = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def format_report(images, settings):
+    """Размер и время кодирования для каждого (формат, уровень) из settings.
+
+    Возвращает список словарей с ключами format, level, bytes, seconds
+    (суммарно по всем изображениям).
+    """
+    rows = []
+    for fmt, level in settings:
+        total_bytes = 0
+        started = time.perf_counter()
+        for image in images:
+            total_bytes += len(encode_sheet(image, fmt, level))
+        rows.append(
+            {
+                "format": fmt,
+                "level": level,
+                "bytes": total_bytes,
+                "seconds": time.perf_counter() - started,
+            }
+        )
+    return rows
+
+
+def _collect_images(paths, limit):
+    from PIL import Image
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name)
+                    for name in sorted(names)
+                    if name.lower().endswith((".png", ".webp"))
+                )
+        else:
+            files.append(path)
+    images = []
+    for filename in files[:limit]:
+        with Image.open(filename) as source:
+            images.append(source.convert("RGB"))
+    return images
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Сравнение форматов сохранения оценочных листов."
+    )
+    parser.add_argument("paths", nargs="+", help="листы или папки с листами")
+    parser.add_argument(
+        "--levels", default="1,6,9", help="уровни сжатия PNG через запятую (по умолчанию 1,6,9)"
+    )
+    parser.add_argument("--limit", type=int, default=50, help="сколько листов взять (по умолчанию 50)")
+    args = parser.parse_args(argv)
+
+    try:
+        levels = [int(level) for level in args.levels.split(",") if level.strip()]
+        for level in levels:
+            check_format(DEFAULT_FORMAT, level)
+    except ValueError as e:
+        parser.error(str(e))
+    images = _collect_images(args.paths, args.limit)
+    if not images:
+        parser.error("Не найдено ни одного листа.")
+
+    settings = [(fmt, level) for fmt in ("png", "png-palette") for level in levels]
+    settings.append(("webp", None))
+    rows = format_report(images, settings)
+    baseline = next(
+        (row["bytes"] for row in rows if row["format"] == DEFAULT_FORMAT and row["level"] == DEFAULT_PNG_LEVEL),
+        rows[0]["bytes"],
+    )
+    print(f"Листов: {len(images)}")
+    print(f"{'формат':<12} {'уровень':>7} {'средний размер':>15} {'к png/6':>8} {'мс на лист':>11}")
+    for row in rows:
+        level = "-" if row["level"] is None else str(row["level"])
+        average_kb = row["bytes"] / len(images) / 1024
+        ratio = row["bytes"] / baseline if baseline else 0.0
+        per_sheet_ms = row["seconds"] / len(images) * 1000
+        print(
+            f"{row['format']:<12} {level:>7} {average_kb:>12.1f} КБ {ratio:>8.2f} {per_sheet_ms:>11.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Пропуск повторной отрисовки листов, входные данные которых не изменились.
+
+Ключ листа — SHA-256 от всего, что влияет на картинку: версии рубрики
+задания (criteria.Homework.version), выбора по разделам, штрафов,
+поощрений, просрочки, комментария, студента/группы/варианта, режимов
+«двойной» и «вариант на 8», а также формата файла. Индекс
+created_files/.render_index.json хранит для каждого сохранённого листа его
+ключ, размер и время изменения; если файл на месте и ключ совпадает,
+лист не рисуется заново. GUI и python -m batch могут работать с одной папкой
+одновременно, поэтому save() перечитывает индекс с диска и дописывает в него
+только свои записи.
+
+RENDER_VERSION нужно увеличивать при любом изменении вёрстки листа
+(rendering.layout_report), иначе старые картинки будут считаться актуальными.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from output import DEFAULT_FORMAT, DEFAULT_PNG_LEVEL, SUB_PATH
+
+RENDER_VERSION = 1
+INDEX_FILENAME = ".render_index.json"
+
+# Поля выбора (см. scoring.py), от которых зависит лист
+KEY_FIELDS = (
+    "homework",
+    "student",
+    "group",
+    "variant",
+    "on_time",
+    "delay",
+    "comment",
+    "double_mode",
+    "limit_to_eight",
+    "sections",
+    "penalties",
+    "rewards",
+)
+
+
+def render_key(selection, rubric_version, fmt=DEFAULT_FORMAT, compress_level=DEFAULT_PNG_LEVEL):
+    payload = {
+        "render": RENDER_VERSION,
+        "rubric": rubric_version,
+        "format": fmt,
+        "level": compress_level,
+        "selection": {field: selection.get(field) for field in KEY_FIELDS},
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _read_entries(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        # Нет индекса или он повреждён — все листы будут нарисованы заново
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+class RenderIndex:
+    """Индекс сохранённых листов: путь относительно base_dir -> ключ, размер, mtime."""
+
+    def __init__(self, base_dir=SUB_PATH):
+        self.base_dir = base_dir
+        self.path = os.path.join(base_dir, INDEX_FILENAME)
+        self._entries = _read_entries(self.path)
+        # Записи, сделанные с последнего save()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _relative(self, filename):
+        return os.path.relpath(filename, self.base_dir).replace(os.sep, "/")
+
+    def is_current(self, filename, key):
+        """True, если файл уже сохранён с этим ключом и с тех пор не менялся."""
+        with self._lock:
+            entry = self._entries.get(self._relative(filename))
+        if not entry or entry.get("key") != key:
+            return False
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+        return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+    def record(self, filename, key):
+        stat = os.stat(filename)
+        entry = {"key": key, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        with self._lock:
+            relative = self._relative(filename)
+            self._entries[relative] = entry
+            self._pending[relative] = entry
+
+    def save(self):
+        """Дописывает новые записи в индекс на диске, не затирая чужие.
+
+        Если другой процесс за это время перерисовал тот же лист, побеждает
+        последняя запись; у проигравшей не совпадут размер или mtime файла,
+        и лист просто будет нарисован заново.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            entries = _read_entries(self.path)
+            entries.update(self._pending)
+            self._entries = entries
+            self._pending = {}
+            data = json.dumps(entries, ensure_ascii=False, sort_keys=True)
+            os.makedirs(self.base_dir, exist_ok=True)
+            # Своё имя временного файла у каждого процесса
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
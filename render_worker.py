@@ -0,0 +1,82 @@
+"""Фоновый поток для отрисовки и сохранения листов.
+
+Tk можно трогать только из главного потока, поэтому RenderWorker не вызывает
+обратные вызовы сам: готовые результаты складываются в очередь, а интерфейс
+забирает их методом poll() из цикла after(). Очередь заданий ограничена,
+чтобы быстрые повторные нажатия не копили сотни несохранённых листов.
+"""
+
+import queue
+import threading
+
+_STOP = object()
+
+
+class RenderWorker:
+    def __init__(self, max_pending=4):
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._results = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """Число заданий, результаты которых ещё не забраны poll()."""
+        with self._lock:
+            return self._pending
+
+    def submit(self, func, on_done=None, on_error=None):
+        """Ставит func() в очередь; False, если очередь заполнена.
+
+        on_done(результат) или on_error(исключение) вызываются из poll().
+        """
+        self._ensure_thread()
+        try:
+            self._jobs.put_nowait((func, on_done, on_error))
+        except queue.Full:
+            return False
+        with self._lock:
+            self._pending += 1
+        return True
+
+    def poll(self):
+        """Выполняет обратные вызовы готовых заданий; возвращает число оставшихся."""
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._pending -= 1
+            if callback is not None:
+                callback(value)
+        return self.pending
+
+    def close(self, timeout=None):
+        """Дожидается выполнения поставленных заданий и останавливает поток."""
+        if self._thread is None:
+            return
+        self._jobs.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="render-worker", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            func, on_done, on_error = job
+            try:
+                result = func()
+            except Exception as e:
+                self._results.put((on_error, e))
+            else:
+                self._results.put((on_done, result))
@@ -0,0 +1,516 @@
+"""Разметка и отрисовка оценочных листов.
+
+Лист строится в два прохода: layout_report измеряет содержимое и возвращает
+ReportLayout, а ReportLayout.draw рисует его на холсте ровно нужной высоты.
+Кэши шрифтов и спрайтов эмодзи живут на уровне процесса, поэтому повторная
+генерация отчёта не загружает заново шрифты и уже встречавшиеся эмодзи.
+"""
+
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+from emoji_atlas import EMOJI_ATLAS_PATH, open_atlas
+from emoji_segmenter import EmojiSegmenter
+from scoring import format_score
+import tracing
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+EMOJI_IMAGES_DIR = os.path.join(BASE_PATH, "emoji_images")
+
+logger = logging.getLogger(__name__)
+
+# Пути к шрифтам (шрифты находятся в той же директории, что и скрипт)
+GILROY_BLACK_PATH = os.path.join(BASE_PATH, "gilroy-black.ttf")
+GILROY_BOLD_PATH = os.path.join(BASE_PATH, "gilroy-bold.ttf")
+GILROY_REGULAR_PATH = os.path.join(BASE_PATH, "gilroy-regular.ttf")
+SEGOE_EMOJI_PATH = os.path.join(BASE_PATH, "segoe-ui-emoji.ttf")
+
+# Используем Image.Resampling.LANCZOS для Pillow >=10
+if hasattr(Image, "Resampling"):
+    RESAMPLE_FILTER = Image.Resampling.LANCZOS
+else:
+    RESAMPLE_FILTER = Image.LANCZOS
+
+
+def emoji_to_codepoints(emoji_char):
+    """
+    Преобразует эмодзи в строку кодовых точек, разделённых дефисами.
+    Например, 😀 -> '1f600'
+    """
+    return "-".join(f"{ord(ch):x}" for ch in emoji_char)
+
+
+class FontRegistry:
+    """Шрифты, загруженные один раз на процесс, по ключу (путь, размер)."""
+
+    def __init__(self):
+        self._fonts = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, size):
+        """Возвращает FreeTypeFont; ошибки загрузки (OSError) не кэшируются."""
+        key = (path, size)
+        with self._lock:
+            font = self._fonts.get(key)
+        if font is None:
+            with tracing.span("font_load", font=os.path.basename(path), size=size):
+                font = ImageFont.truetype(path, size)
+            with self._lock:
+                font = self._fonts.setdefault(key, font)
+        return font
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+
+
+class EmojiSpriteCache:
+    """LRU-кэш декодированных и отмасштабированных спрайтов эмодзи.
+
+    Ключ — пара (последовательность кодовых точек, высота в пикселях).
+    Отсутствующие PNG тоже запоминаются, чтобы не обращаться к диску повторно.
+    Исходные PNG берутся из атласа (см. emoji_atlas.py), а если атлас не собран,
+    устарел или в нём нет нужного эмодзи — из каталога emoji_images.
+    """
+
+    def __init__(
+        self, image_dir=EMOJI_IMAGES_DIR, atlas_path=EMOJI_ATLAS_PATH, max_entries=1024
+    ):
+        self.image_dir = image_dir
+        self.atlas_path = atlas_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._sprites = OrderedDict()
+        self._atlas = None
+        self._atlas_checked = False
+        self._lock = threading.Lock()
+
+    @property
+    def atlas(self):
+        """Атлас открывается при первом обращении; None, если он не собран."""
+        with self._lock:
+            if not self._atlas_checked:
+                self._atlas_checked = True
+                if self.atlas_path:
+                    self._atlas = open_atlas(self.atlas_path, self.image_dir)
+            return self._atlas
+
+    def get(self, codepoint_seq, height):
+        """Возвращает RGBA-спрайт нужной высоты или None, если PNG нет.
+
+        Ошибки декодирования пробрасываются вызывающему коду и не кэшируются.
+        """
+        key = (codepoint_seq, height)
+        with self._lock:
+            if key in self._sprites:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                sprite = self._sprites[key]
+                hit = True
+            else:
+                self.misses += 1
+                hit = False
+        if hit:
+            tracing.count("emoji_hits")
+            return sprite
+
+        tracing.count("emoji_misses")
+        with tracing.span("emoji_decode", emoji=codepoint_seq, height=height):
+            sprite = self._load(codepoint_seq, height)
+
+        with self._lock:
+            self._sprites[key] = sprite
+            self._sprites.move_to_end(key)
+            while len(self._sprites) > self.max_entries:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    def _load(self, codepoint_seq, height):
+        atlas = self.atlas
+        data = atlas.get(codepoint_seq) if atlas is not None else None
+        if data is not None:
+            source = Image.open(io.BytesIO(data))
+        else:
+            filename = os.path.join(self.image_dir, f"{codepoint_seq}.png")
+            if not os.path.exists(filename):
+                return None
+            source = Image.open(filename)
+        with source:
+            emoji_image = source.convert("RGBA")
+        return emoji_image.resize((height, height), resample=RESAMPLE_FILTER)
+
+    def sequences(self):
+        """Последовательности кодовых точек, для которых есть PNG (атлас и каталог)."""
+        atlas = self.atlas
+        available = set(atlas.sequences()) if atlas is not None else set()
+        try:
+            names = os.listdir(self.image_dir)
+        except OSError:
+            names = []
+        available.update(name[:-4] for name in names if name.endswith(".png"))
+        return available
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._sprites),
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._sprites.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Кэши общие для всех отчётов в рамках процесса
+fonts = FontRegistry()
+emoji_sprites = EmojiSpriteCache()
+_emoji_segmenter = None
+_emoji_segmenter_lock = threading.Lock()
+
+
+def emoji_segmenter():
+    """EmojiSegmenter по доступным спрайтам; строится при первом обращении."""
+    global _emoji_segmenter
+    with _emoji_segmenter_lock:
+        if _emoji_segmenter is None:
+            _emoji_segmenter = EmojiSegmenter(emoji_sprites.sequences())
+        return _emoji_segmenter
+
+
+SHEET_WIDTH = 1200
+BACKGROUND_COLOR = (255, 255, 255)
+TEXT_COLOR = (0, 0, 0)
+
+# Шрифты листа: (путь, размер)
+TITLE_FONT = (GILROY_BLACK_PATH, 36)
+HEADER_FONT = (GILROY_BOLD_PATH, 24)
+TEXT_FONT = (GILROY_REGULAR_PATH, 18)
+EMOJI_FONT = (SEGOE_EMOJI_PATH, 18)
+
+PENALTIES_HEADING = "Дополнительные штрафы:"
+REWARDS_HEADING = "И ещё кое-что:"
+COMMENT_HEADING = "Комментарий:"
+STATIC_HEADINGS = (PENALTIES_HEADING, REWARDS_HEADING, COMMENT_HEADING)
+
+
+def split_text_and_emojis(text):
+    """
+    Разделяет текст на сегменты: обычный текст и эмодзи.
+    Возвращает кортеж пар вида ('text', текст) или ('emoji', эмодзи);
+    эмодзи без PNG тоже выделяются и рисуются шрифтом EMOJI_FONT
+    (см. emoji_segmenter.py).
+    """
+    return emoji_segmenter().split(text)
+
+
+class ReportLayout:
+    """Размещённые элементы оценочного листа — результат прохода измерения.
+
+    Элементы (runs) — кортежи одного из видов:
+        ("text", x, y, текст, путь к шрифту, размер)
+        ("emoji", x, y, кодовые точки, высота)
+        ("line", x0, y0, x1, y1)
+    Координаты заданы для масштаба 1, поэтому тот же макет можно
+    отрисовать в другом масштабе без повторного измерения.
+    """
+
+    def __init__(self, width, height, runs):
+        self.width = width
+        self.height = height
+        self.runs = runs
+
+    def draw(self, scale=1.0, template=None):
+        """Проход отрисовки: холст ровно под содержимое.
+
+        Строки, известные шаблону (SheetTemplate), не растеризуются заново,
+        а накладываются из его кэша масок.
+        """
+
+        def scaled(value):
+            return int(round(value * scale))
+
+        img = Image.new(
+            "RGB", (scaled(self.width), scaled(self.height)), color=BACKGROUND_COLOR
+        )
+        draw = ImageDraw.Draw(img)
+        text_runs = template_runs = 0
+        for run in self.runs:
+            kind = run[0]
+            if kind == "text":
+                _, x, y, text, font_path, size = run
+                if template is not None and template.covers(text, font_path, size):
+                    mask, left, top = template.mask(text, font_path, max(1, scaled(size)))
+                    img.paste(TEXT_COLOR, (scaled(x) + left, scaled(y) + top), mask)
+                    template_runs += 1
+                    continue
+                text_runs += 1
+                font = fonts.get(font_path, max(1, scaled(size)))
+                draw.text((scaled(x), scaled(y)), text, font=font, fill=TEXT_COLOR)
+            elif kind == "emoji":
+                _, x, y, codepoint_seq, height = run
+                sprite = emoji_sprites.get(codepoint_seq, max(1, scaled(height)))
+                img.paste(sprite, (scaled(x), scaled(y)), sprite)
+            elif kind == "line":
+                _, x0, y0, x1, y1 = run
+                draw.line(
+                    (scaled(x0), scaled(y0), scaled(x1), scaled(y1)),
+                    fill=TEXT_COLOR,
+                    width=max(1, scaled(1)),
+                )
+        tracing.count("text_runs", text_runs)
+        tracing.count("template_runs", template_runs)
+        return img
+
+
+class LayoutBuilder:
+    """Проход измерения: строки размещаются сверху вниз по курсору y."""
+
+    def __init__(self, width=SHEET_WIDTH, top=20):
+        self.width = width
+        self.y = top
+        self.runs = []
+
+    def skip(self, dy):
+        self.y += dy
+
+    def rule(self, x0, x1):
+        self.runs.append(("line", x0, self.y, x1, self.y))
+
+    def text_width(self, text, font_spec):
+        bbox = fonts.get(*font_spec).getbbox(text)
+        return bbox[2] - bbox[0]
+
+    def text(self, x, text, font_spec):
+        """Размещает строку с эмодзи и сдвигает курсор на её высоту плюс 5."""
+        font_regular = fonts.get(*font_spec)
+        current_x = x
+        max_height = 0
+
+        for typ, segment in split_text_and_emojis(text):
+            run_font = font_spec
+            if typ == "emoji":
+                codepoint_seq = emoji_to_codepoints(segment)
+                # Изменяем размер эмодзи, чтобы соответствовать высоте текста
+                # Используем метод getbbox для символа 'A' как репрезентативного
+                text_bbox = font_regular.getbbox("A")
+                text_height = int(1.5 * text_bbox[3] - text_bbox[1])
+                try:
+                    emoji_image = emoji_sprites.get(codepoint_seq, text_height)
+                except (OSError, ValueError) as e:
+                    # Повреждённый PNG (ошибка декодирования Pillow) — рисуем эмодзи как текст
+                    logger.warning("Эмодзи %s не загружено: %s", codepoint_seq, e)
+                    tracing.count("emoji_errors")
+                else:
+                    if emoji_image is not None:
+                        self.runs.append(
+                            ("emoji", current_x, self.y, codepoint_seq, text_height)
+                        )
+                        current_x += text_height  # Смещаемся вправо на ширину эмодзи
+                        max_height = max(max_height, text_height)
+                        continue
+                    # Если изображение эмодзи не найдено, рисуем его как текст.
+                    # Шрифт Segoe загружается только при первой такой встрече.
+                    try:
+                        fonts.get(*EMOJI_FONT)
+                        run_font = EMOJI_FONT
+                    except IOError:
+                        pass
+
+            self.runs.append(("text", current_x, self.y, segment) + tuple(run_font))
+            bbox = fonts.get(*run_font).getbbox(segment)
+            current_x += bbox[2] - bbox[0]
+            max_height = max(max_height, bbox[3] - bbox[1])
+
+        self.y += max_height + 5
+
+    def finish(self, bottom_margin=20):
+        return ReportLayout(self.width, self.y + bottom_margin, self.runs)
+
+
+class SheetTemplate:
+    """Неизменные строки листа одной домашней работы, растеризованные один раз.
+
+    Лист свёрстан потоком, и положение заголовков зависит от числа
+    комментариев выше, поэтому шаблон хранит не готовый холст, а маски
+    строк: заголовок листа, названия разделов, подзаголовки, «Нет», тексты
+    подпунктов, штрафов и поощрений из criteria.json. ReportLayout.draw
+    накладывает их тем же цветом и по тем же координатам, что и draw.text,
+    поэтому результат совпадает попиксельно; растеризуются заново только
+    строки конкретного студента (ФИО, баллы, итог, комментарий).
+    """
+
+    # Отступ вокруг рамки глифов: нулевые пиксели маски холст не меняют
+    PADDING = 2
+
+    def __init__(self, lines=()):
+        builder = LayoutBuilder()
+        for text, font_spec in lines:
+            builder.text(0, text, font_spec)
+        # Ключи — готовые текстовые элементы (после отделения эмодзи)
+        self._runs = {run[3:] for run in builder.runs if run[0] == "text"}
+        self._masks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._runs)
+
+    def covers(self, text, font_path, size):
+        return (text, font_path, size) in self._runs
+
+    def mask(self, text, font_path, size):
+        """Маска «L» строки и смещение её левого верхнего угла от точки вывода."""
+        key = (text, font_path, size)
+        with self._lock:
+            cached = self._masks.get(key)
+        if cached is None:
+            font = fonts.get(font_path, size)
+            left, top, right, bottom = font.getbbox(text)
+            left -= self.PADDING
+            top -= self.PADDING
+            mask = Image.new(
+                "L", (right - left + self.PADDING, bottom - top + self.PADDING), 0
+            )
+            ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+            cached = (mask, left, top)
+            with self._lock:
+                cached = self._masks.setdefault(key, cached)
+        return cached
+
+
+def sheet_template(sections, penalties=(), rewards=()):
+    """SheetTemplate для разделов домашней работы (словари из criteria.json).
+
+    Передавайте все разделы задания (base и extended): лишние строки в
+    шаблоне ничего не стоят, пока не встретятся в листе.
+    """
+    lines = [("Оценочный лист", TITLE_FONT)]
+    lines += [(heading, HEADER_FONT) for heading in STATIC_HEADINGS]
+    lines.append(("Нет", TEXT_FONT))
+    for section in sections:
+        lines.append((section.get("title", ""), HEADER_FONT))
+        for option in section.get("options", []):
+            for subtext in option.get("suboptions") or []:
+                lines.append((f"- {subtext}", TEXT_FONT))
+    lines += [(f"- {penalty.get('text', '')}", TEXT_FONT) for penalty in penalties]
+    lines += [(reward.get("text", "").strip(), TEXT_FONT) for reward in rewards]
+    return SheetTemplate(lines)
+
+
+def warm_caches(texts=()):
+    """Загружает шрифты листа и спрайты эмодзи из texts (например, поощрений).
+
+    Вызывается один раз в каждом рабочем процессе пакетной генерации.
+    """
+    for font_spec in (TITLE_FONT, HEADER_FONT, TEXT_FONT):
+        fonts.get(*font_spec)
+    builder = LayoutBuilder()
+    for text in texts:
+        builder.text(0, text, TEXT_FONT)
+
+
+def layout_report(report, width=SHEET_WIDTH):
+    """Измеряет оценочный лист и возвращает ReportLayout.
+
+    report — словарь с ключами student, group, variant, on_time, delay_days,
+    variant_cap (None, если двойной режим выключен), section_scores,
+    section_comments, penalty_comments, reward_comments, final_score,
+    max_score_cap и comment. Ошибки загрузки шрифтов (OSError) пробрасываются.
+    """
+    builder = LayoutBuilder(width)
+
+    # Заголовок по центру
+    header_text = "Оценочный лист"
+    header_x = (width - builder.text_width(header_text, TITLE_FONT)) // 2
+    builder.text(header_x, header_text, TITLE_FONT)
+    builder.skip(20)  # Добавляем отступ после заголовка
+
+    # Информация о студенте
+    student_info = (
+        f"Студент: {report['student']}    Группа: {report['group']}"
+        f"    Вариант: {report['variant']}"
+    )
+    builder.text(50, student_info, TEXT_FONT)
+    builder.skip(10)
+
+    if report.get("variant_cap") is not None:
+        cap_text = format_score(report["variant_cap"])
+        builder.text(50, f"Вариант работы: максимум {cap_text} баллов", TEXT_FONT)
+        builder.skip(10)
+
+    # Информация о сдаче
+    date_info = (
+        f"Сдано вовремя: {'Да' if report['on_time'] else 'Нет'}"
+        f"    Дней просрочки: {report['delay_days']}"
+    )
+    builder.text(50, date_info, TEXT_FONT)
+    builder.skip(20)
+
+    # Критерии
+    section_comments = report.get("section_comments", {})
+    for section, score in report["section_scores"].items():
+        builder.text(50, section, HEADER_FONT)
+        builder.skip(10)
+        builder.text(70, f"Баллы: {format_score(score)}", TEXT_FONT)
+        builder.skip(5)
+        for comment_text in section_comments.get(section, []):
+            builder.text(90, f"- {comment_text}", TEXT_FONT)
+            builder.skip(5)
+        builder.skip(10)
+
+    # Штрафы
+    builder.text(50, PENALTIES_HEADING, HEADER_FONT)
+    builder.skip(10)
+    penalty_comments = report.get("penalty_comments") or []
+    for comment_text in penalty_comments:
+        builder.text(70, f"- {comment_text}", TEXT_FONT)
+        builder.skip(5)
+    if not penalty_comments:
+        builder.text(70, "Нет", TEXT_FONT)
+        builder.skip(5)
+    builder.skip(10)
+
+    # Поощрения
+    builder.text(50, REWARDS_HEADING, HEADER_FONT)
+    builder.skip(10)
+    reward_comments = report.get("reward_comments") or []
+    for reward in reward_comments:
+        builder.text(70, reward, TEXT_FONT)
+        builder.skip(5)
+    if not reward_comments:
+        builder.text(70, "Нет", TEXT_FONT)
+        builder.skip(5)
+    builder.skip(10)
+
+    # Разделительная линия
+    builder.rule(50, width - 50)
+    builder.skip(10)
+
+    # Итоговая оценка
+    final_score_text = (
+        f"Итоговая оценка: {format_score(report['final_score'])}"
+        f" из {format_score(report['max_score_cap'])}"
+    )
+    builder.text(50, final_score_text, HEADER_FONT)
+    builder.skip(20)
+
+    # Комментарий
+    comment = report.get("comment")
+    if comment:
+        builder.text(50, COMMENT_HEADING, HEADER_FONT)
+        builder.skip(10)
+        for line in comment.split("\n"):
+            builder.text(70, line, TEXT_FONT)
+            builder.skip(5)
+
+    return builder.finish()
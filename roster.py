@@ -0,0 +1,325 @@
+"""Чтение и запись списка студентов (student_list.csv) без Tk."""
+
+import argparse
+import codecs
+import csv
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+STUDENT_LIST_FILENAME = "student_list.csv"
+JOURNAL_SUFFIX = ".journal"
+FIELDNAMES = ["ФИО", "Группа", "Номер Варианта"]
+
+
+def create_student_list_template(filename=STUDENT_LIST_FILENAME):
+    with open(filename, "w", encoding="utf-8", newline="") as csvfile:
+        csvfile.write("ФИО;Группа;Номер Варианта\n")
+
+
+# Заголовки выгрузок LMS: для каждого поля берётся первый непустой столбец
+FIO_HEADERS = ("ФИО",)
+NAME_PART_HEADERS = ("Фамилия", "Имя")
+GROUP_HEADERS = ("Группа", "Группы", "Данные о пользователе")
+VARIANT_HEADERS = ("Номер Варианта", "Вариант")
+DELIMITERS = (";", ",", "\t")
+# Сколько байт начала файла смотреть, чтобы угадать кодировку и разделитель
+SNIFF_BYTES = 64 * 1024
+
+
+class StudentRecord:
+    """Компактная запись студента с доступом как у словаря: record["ФИО"].
+
+    Вместо словаря на строку хранится три поля в __slots__ — на списке в
+    сотню тысяч строк это в несколько раз меньше памяти.
+    """
+
+    __slots__ = ("fio", "group", "variant")
+    _KEYS = {"ФИО": "fio", "Группа": "group", "Номер Варианта": "variant"}
+
+    def __init__(self, fio, group, variant=""):
+        self.fio = fio
+        self.group = group
+        self.variant = variant
+
+    def __getitem__(self, key):
+        return getattr(self, self._KEYS[key])
+
+    def __setitem__(self, key, value):
+        setattr(self, self._KEYS[key], value)
+
+    def get(self, key, default=None):
+        attr = self._KEYS.get(key)
+        return default if attr is None else getattr(self, attr)
+
+    def __eq__(self, other):
+        if isinstance(other, StudentRecord):
+            return (self.fio, self.group, self.variant) == (other.fio, other.group, other.variant)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"StudentRecord({self.fio!r}, {self.group!r}, {self.variant!r})"
+
+
+def _sniff(filename):
+    """(кодировка, разделитель) по первому блоку файла."""
+    with open(filename, "rb") as f:
+        sample = f.read(SNIFF_BYTES)
+    encoding = "utf-8-sig"
+    try:
+        # Блок может оборваться посреди многобайтового символа
+        text = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+    except UnicodeDecodeError:
+        # Выгрузки из Excel под Windows
+        encoding = "cp1251"
+        text = sample.decode(encoding, errors="replace")
+    header = text.splitlines()[0] if text else ""
+    counts = [header.count(delimiter) for delimiter in DELIMITERS]
+    delimiter = DELIMITERS[counts.index(max(counts))] if max(counts) else ";"
+    return encoding, delimiter
+
+
+def _column_getter(header, names):
+    """Функция строки -> первое непустое значение из столбцов names (или "")."""
+    positions = {}
+    for index, key in enumerate(header):
+        # Как у csv.DictReader: при повторе заголовка побеждает последний столбец
+        positions[key.strip().lstrip("\ufeff")] = index
+    indexes = tuple(positions[name] for name in names if name in positions)
+
+    def get(row):
+        for index in indexes:
+            if index < len(row) and row[index]:
+                return row[index]
+        return ""
+
+    return get
+
+
+def read_student_list(filename=STUDENT_LIST_FILENAME):
+    """Возвращает список записей StudentRecord ("ФИО", "Группа", "Номер Варианта").
+
+    Кодировка (UTF-8 или cp1251), разделитель (';', ',' или табуляция) и
+    столбцы определяются один раз по началу файла, после чего строки
+    читаются одним проходом. Поддерживаются альтернативные заголовки
+    выгрузок LMS ("Фамилия"/"Имя", "Группы", "Данные о пользователе", "Вариант").
+    """
+    encoding, delimiter = _sniff(filename)
+    records = []
+    with open(filename, encoding=encoding, newline="") as csvfile:
+        reader = csv.reader(csvfile, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return records
+        get_fio = _column_getter(header, FIO_HEADERS)
+        name_parts = [_column_getter(header, (name,)) for name in NAME_PART_HEADERS]
+        get_group = _column_getter(header, GROUP_HEADERS)
+        get_variant = _column_getter(header, VARIANT_HEADERS)
+        for row in reader:
+            fio = get_fio(row) or " ".join(
+                part for part in (get(row).strip() for get in name_parts) if part
+            )
+            fio = fio.strip()
+            group_name = get_group(row).strip()
+            if not (fio and group_name):
+                continue
+            records.append(StudentRecord(fio, group_name, get_variant(row).strip()))
+    return records
+
+
+def load_report(filename=STUDENT_LIST_FILENAME):
+    """(записи, секунды, пик памяти Python в байтах) для чтения списка.
+
+    tracemalloc заметно замедляет чтение, поэтому время и память меряются
+    отдельными проходами.
+    """
+    started = time.perf_counter()
+    records = read_student_list(filename)
+    elapsed = time.perf_counter() - started
+    del records
+    tracemalloc.start()
+    try:
+        records = read_student_list(filename)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return records, elapsed, peak
+
+
+def write_student_list(records, filename=STUDENT_LIST_FILENAME):
+    """Перезаписывает файл целиком через временный файл и переименование.
+
+    При сбое во время записи старый список остаётся нетронутым.
+    """
+    tmp_path = filename + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, delimiter=";")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(
+                {
+                    "ФИО": record.get("ФИО", ""),
+                    "Группа": record.get("Группа", ""),
+                    "Номер Варианта": record.get("Номер Варианта", ""),
+                }
+            )
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+    os.replace(tmp_path, filename)
+
+
+class VariantJournal:
+    """Журнал правок вариантов рядом со списком (student_list.csv.journal).
+
+    Правка сначала попадает в буфер (add), буфер дописывается в конец
+    журнала одной записью на студента (flush), а полный список
+    перезаписывается только при compact. Если программа упала до compact,
+    replay при следующем запуске повторяет правки из журнала; недописанная
+    последняя строка пропускается.
+    """
+
+    def __init__(self, filename=STUDENT_LIST_FILENAME):
+        self.filename = filename
+        self.path = filename + JOURNAL_SUFFIX
+        self._pending = {}
+
+    @property
+    def has_entries(self):
+        """Есть правки, которых ещё нет в самом списке."""
+        return bool(self._pending) or os.path.exists(self.path)
+
+    def add(self, group, name, variant_number):
+        # Повторная правка того же студента до flush заменяет предыдущую
+        self._pending[(group, name)] = variant_number
+
+    def flush(self):
+        if not self._pending:
+            return
+        lines = "".join(
+            json.dumps({"Группа": group, "ФИО": name, "Номер Варианта": variant}, ensure_ascii=False)
+            + "\n"
+            for (group, name), variant in self._pending.items()
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending.clear()
+
+    def replay(self, roster):
+        """Применяет журнал к RosterIndex; возвращает число применённых правок."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return 0
+        applied = 0
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                record = roster.set_variant(entry["Группа"], entry["ФИО"], entry["Номер Варианта"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            if record is not None:
+                applied += 1
+        return applied
+
+    def compact(self, records):
+        """Переносит все правки в список и очищает журнал."""
+        self._pending.clear()
+        write_student_list(records, self.filename)
+        # Журнал удаляется только после замены списка: повторный replay безвреден
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class RosterIndex:
+    """Список студентов, разложенный по группам один раз при загрузке.
+
+    Для каждой группы хранятся записи и ФИО в порядке навигации GUI
+    (по ФИО), позиция студента в группе и запись по
+    (группа, ФИО). Записи общие с records, поэтому set_variant меняет их на
+    месте и перестраивать индекс не нужно: порядок от варианта не зависит.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        by_group = {}
+        for record in records:
+            by_group.setdefault(record["Группа"], []).append(record)
+        self.groups = sorted(by_group)
+        self._students = {}
+        self._names = {}
+        self._positions = {}
+        self._lookup = {}
+        for group, group_records in by_group.items():
+            group_records.sort(key=lambda x: x["ФИО"])
+            self._students[group] = tuple(group_records)
+            self._names[group] = tuple(record["ФИО"] for record in group_records)
+            for position, record in enumerate(group_records):
+                # При повторе ФИО позиция — первая (как list.index), запись — последняя
+                self._positions.setdefault((group, record["ФИО"]), position)
+                self._lookup[(group, record["ФИО"])] = record
+
+    def students(self, group):
+        return self._students.get(group, ())
+
+    def names(self, group):
+        return self._names.get(group, ())
+
+    def position(self, group, name):
+        """Номер студента в отсортированной группе (с 0) или None."""
+        return self._positions.get((group, name))
+
+    def record(self, group, name):
+        return self._lookup.get((group, name))
+
+    def set_variant(self, group, name, variant_number):
+        """Записывает вариант студенту; возвращает запись или None, если его нет в списке."""
+        record = self._lookup.get((group, name))
+        if record is not None:
+            record["Номер Варианта"] = variant_number
+        return record
+
+
+def resolve_variant(record, student_number, variant_count):
+    """Сохранённый вариант студента или вычисленный по его номеру в группе.
+
+    student_number считается с 1; при превышении variant_count варианты идут по кругу.
+    """
+    variant_number = ""
+    if record:
+        variant_number = record.get("Номер Варианта", "").strip()
+
+    if not variant_number:
+        if student_number > variant_count:
+            variant_number = student_number % variant_count
+            if variant_number == 0:
+                variant_number = variant_count
+        else:
+            variant_number = student_number
+    return str(variant_number)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Время и память на чтение списка студентов."
+    )
+    parser.add_argument("filename", nargs="?", default=STUDENT_LIST_FILENAME)
+    args = parser.parse_args(argv)
+
+    encoding, delimiter = _sniff(args.filename)
+    records, elapsed, peak = load_report(args.filename)
+    groups = len({record.group for record in records})
+    print(f"Кодировка: {encoding}, разделитель: {delimiter!r}")
+    print(f"Студентов: {len(records)}, групп: {groups}")
+    print(f"Чтение: {elapsed * 1000:.0f} мс, пик памяти: {peak / 1024 / 1024:.1f} МБ")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
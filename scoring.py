@@ -0,0 +1,558 @@
+"""Подсчёт баллов оценочного листа без Tk.
+
+Состояние оценивания передаётся «выбором» (selection) — словарём, который
+GUI снимает со своих переменных (EvaluationApp.collect_selection), а пакетный
+режим читает из файла:
+
+    {
+        "homework": "ДЗ_3",
+        "student": "Иванов Иван", "group": "ИГ-101", "variant": "3",
+        "on_time": True, "delay": "0", "comment": "",
+        "double_mode": False, "limit_to_eight": True,
+        "sections": {
+            "<заголовок radio_with_subchecks>": {"score": -1.0, "suboptions": [[1, 0], [1, 2]]},
+            "<заголовок checkbox>": {"checked": [0, 2]},
+        },
+        "penalties": [0, 3],
+        "rewards": [5],
+    }
+
+Индексы считаются с нуля; suboptions — пары (номер варианта, номер подпункта).
+"""
+
+
+class ScoringError(ValueError):
+    """Некорректные входные данные; текст сообщения показывается пользователю."""
+
+
+def format_score(value):
+    if isinstance(value, (int, float)):
+        formatted = f"{float(value):.2f}".rstrip("0").rstrip(".")
+        return formatted if formatted else "0"
+    return str(value)
+
+
+def criteria_sections(source, limit_to_eight):
+    """Список разделов для домашнего задания с учётом base/extended."""
+    if isinstance(source, dict):
+        base_sections = source.get("base", [])
+        extended_sections = source.get("extended", [])
+        use_extended = not limit_to_eight
+        return list(base_sections) + (list(extended_sections) if use_extended else [])
+    if isinstance(source, list):
+        return source
+    return []
+
+
+def default_section_selection(section):
+    """Выбор раздела «на максимум», как после set_criteria_to_max."""
+    options = section.get("options", [])
+    if section.get("type") == "radio_with_subchecks":
+        if not options:
+            return {"score": 0.0, "suboptions": []}
+        max_option = max(options, key=lambda x: float(x.get("score", 0.0)))
+        return {"score": float(max_option["score"]), "suboptions": []}
+    if section.get("type") == "checkbox":
+        return {
+            "checked": [
+                index
+                for index, option in enumerate(options)
+                if float(option.get("score", 0.0)) > 0
+            ]
+        }
+    return {}
+
+
+def default_selection(sections):
+    return {
+        section.get("title", ""): default_section_selection(section)
+        for section in sections
+    }
+
+
+def resolve_scoring_scale(section_total_max, limit_to_eight, double_mode_on):
+    section_total_max = float(section_total_max or 0.0)
+
+    if limit_to_eight:
+        target_cap = 8.0
+        effective_cap = min(section_total_max, target_cap) if section_total_max > 0 else target_cap
+        return max(0.0, effective_cap), target_cap, 1.0
+
+    if double_mode_on:
+        target_cap = 10.0
+        effective_cap = target_cap
+        return max(0.0, effective_cap), target_cap, 1.0
+
+    display_cap = section_total_max if section_total_max > 0 else 10.0
+    effective_cap = section_total_max
+    return max(0.0, effective_cap), display_cap, 1.0
+
+
+def parse_delay_days(delay_raw):
+    delay_raw = str(delay_raw if delay_raw is not None else "").strip()
+    if not delay_raw:
+        return 0
+    try:
+        delay_days = int(delay_raw)
+    except ValueError:
+        raise ScoringError("Количество дней просрочки должно быть целым числом.")
+    if delay_days < 0:
+        raise ScoringError("Количество дней просрочки не может быть отрицательным.")
+    return delay_days
+
+
+def _score_section(section, state, max_score):
+    comments = []
+    score = 0.0
+    options = section.get("options", [])
+
+    if section.get("type") == "radio_with_subchecks":
+        main_score = float(state.get("score", 0.0))
+        selected_index = None
+
+        for index, option in enumerate(options):
+            opt_score = float(option.get("score", 0.0))
+            if abs(opt_score - main_score) < 1e-9:
+                selected_index = index
+                break
+
+        if selected_index is not None:
+            selected_option = options[selected_index]
+            suboptions = selected_option.get("suboptions") or []
+            if suboptions:
+                checked = {
+                    sub_index
+                    for option_index, sub_index in state.get("suboptions", [])
+                    if option_index == selected_index
+                }
+                num_selected_checkboxes = 0
+                for sub_index, subtext in enumerate(suboptions):
+                    if sub_index in checked:
+                        num_selected_checkboxes += 1
+                        comments.append(subtext)
+
+                deduction = abs(main_score) * num_selected_checkboxes
+                deduction = min(deduction, max_score)
+                score = max_score - deduction
+            else:
+                # Если нет субопций, score равен main_score, если он положительный,
+                # или (max_score + main_score), если main_score отрицательный
+                if main_score >= 0:
+                    score = main_score
+                else:
+                    # Пример: max_score=10, main_score=-0.5 -> score=10 - 0.5 = 9.5
+                    score = max_score + main_score
+
+    elif section.get("type") == "checkbox":
+        # Суммируем баллы за выбранные чекбоксы
+        checked = set(state.get("checked", []))
+        score_sum = 0.0
+        for index, option in enumerate(options):
+            if index in checked:
+                score_sum += float(option.get("score", 0.0))
+        # Ограничиваем в пределах 0 и max_score
+        score = max(0.0, min(max_score, score_sum))
+
+    return score, comments
+
+
+def compute_report(sections, selection, penalties=(), rewards=()):
+    """Считает баллы и возвращает словарь, готовый для rendering.layout_report.
+
+    sections — список разделов критериев, penalties и rewards — списки из
+    criteria.json. Некорректная просрочка приводит к ScoringError.
+    """
+    limit_to_eight = bool(selection.get("limit_to_eight", True))
+    double_mode_active = bool(selection.get("double_mode", False))
+    section_states = selection.get("sections", {})
+
+    # Разделы с одинаковым заголовком ведут себя как в GUI: побеждает последний
+    sections_by_title = {}
+    section_max_scores = {}
+    for section in sections:
+        title = section.get("title", "")
+        sections_by_title[title] = section
+        section_max_scores[title] = float(section.get("max_score", 0))
+
+    # Рассчитываем баллы по критериям
+    section_scores = {}
+    section_comments = {}
+    for title, section in sections_by_title.items():
+        state = section_states.get(title)
+        if state is None:
+            state = default_section_selection(section)
+        score, comments = _score_section(section, state, section_max_scores[title])
+        section_scores[title] = score
+        section_comments[title] = comments
+
+    # Учёт штрафов
+    penalty_score = 0.0
+    penalty_comments = []
+    disqualified = False
+    checked_penalties = set(selection.get("penalties", []))
+    for index, penalty in enumerate(penalties):
+        if index not in checked_penalties:
+            continue
+        val = float(penalty.get("score", 0))
+        text = penalty.get("text", "")
+        if val <= -1000:
+            disqualified = True
+            penalty_comments.append(text)
+        else:
+            penalty_score += val
+            penalty_comments.append(text)
+
+    # Учёт просрочки
+    delay_days = parse_delay_days(selection.get("delay", 0))
+    on_time = bool(selection.get("on_time", True))
+    effective_delay_days = delay_days
+    if not on_time and effective_delay_days == 0:
+        effective_delay_days = 1
+
+    forced_zero_due_to_delay = effective_delay_days > 0
+    if forced_zero_due_to_delay:
+        penalty_comments.append(
+            f"Работа сдана с просрочкой на {effective_delay_days} дн. Итоговая оценка 0 согласно правилам."
+        )
+
+    reward_comments = []
+    reward_bonus = 0.0
+    checked_rewards = set(selection.get("rewards", []))
+    for index, reward in enumerate(rewards):
+        if index in checked_rewards:
+            reward_comments.append(reward.get("text", "").strip())
+            reward_bonus += float(reward.get("score", 0) or 0)
+
+    if disqualified:
+        penalty_score = 0.0
+        reward_bonus = 0.0
+
+    max_total_score = sum(section_max_scores.values()) or 0.0
+    effective_cap, _display_cap, scaling_factor = resolve_scoring_scale(
+        max_total_score, limit_to_eight, double_mode_active
+    )
+    result_display_cap = 10.0  # Всегда показываем итог как «… из 10»
+
+    if scaling_factor != 1.0:
+        section_scores = {
+            key: value * scaling_factor for key, value in section_scores.items()
+        }
+        penalty_score *= scaling_factor
+        reward_bonus *= scaling_factor
+    total_score = sum(section_scores.values())
+
+    if limit_to_eight:
+        base_cap = effective_cap if effective_cap > 0 else 8.0
+        reference_max = max_total_score if max_total_score > 0 else base_cap
+        lost_points = max(0.0, reference_max - total_score)
+        adjusted_total = base_cap - lost_points + penalty_score + reward_bonus
+        final_score = max(0.0, min(base_cap, adjusted_total))
+    elif double_mode_active:
+        base_cap = effective_cap if effective_cap > 0 else 10.0
+        reference_max = max_total_score if max_total_score > 0 else base_cap
+        scaling_ratio = (base_cap / reference_max) if reference_max > 0 else 1.0
+        lost_points = max(0.0, reference_max - total_score)
+        adjusted_total = base_cap - (lost_points * scaling_ratio) + penalty_score + reward_bonus
+        final_score = max(0.0, min(base_cap, adjusted_total))
+    elif effective_cap > 0:
+        base_total = total_score + penalty_score + reward_bonus
+        final_score = max(0.0, min(effective_cap, base_total))
+    else:
+        final_score = max(0.0, total_score + penalty_score + reward_bonus)
+
+    if forced_zero_due_to_delay:
+        final_score = 0.0
+
+    variant_cap = None
+    if double_mode_active:
+        variant_cap = 8 if limit_to_eight else 10
+
+    return {
+        "student": selection.get("student", ""),
+        "group": selection.get("group", ""),
+        "variant": selection.get("variant", ""),
+        "on_time": on_time,
+        "delay_days": effective_delay_days,
+        "variant_cap": variant_cap,
+        "section_scores": section_scores,
+        "section_comments": section_comments,
+        "penalty_comments": penalty_comments,
+        "reward_comments": reward_comments,
+        "final_score": final_score,
+        "max_score_cap": result_display_cap,
+        "comment": selection.get("comment", ""),
+    }
+
+
+class SelectionMatrix:
+    """Выбор N студентов для одного CompiledHomework в виде массивов NumPy.
+
+    option      int   N×R  — индекс выбранного варианта в каждом radio-разделе (-1 — не выбран)
+    subchecks   bool  N×S  — подпункты всех вариантов всех radio-разделов подряд
+    checks      bool  N×C  — пункты всех checkbox-разделов подряд
+    penalties   bool  N×P,  rewards  bool  N×W
+    delay       int   N,    on_time, double_mode  bool  N
+    """
+
+    __slots__ = (
+        "option", "subchecks", "checks", "penalties", "rewards",
+        "delay", "on_time", "double_mode",
+    )
+
+    def __init__(self, option, subchecks, checks, penalties, rewards, delay, on_time, double_mode):
+        self.option = option
+        self.subchecks = subchecks
+        self.checks = checks
+        self.penalties = penalties
+        self.rewards = rewards
+        self.delay = delay
+        self.on_time = on_time
+        self.double_mode = double_mode
+
+    def __len__(self):
+        return len(self.delay)
+
+
+class CompiledHomework:
+    """Критерии задания, разложенные по массивам для пакетного подсчёта.
+
+    score() повторяет compute_report для всех студентов за один проход и
+    совпадает с ним побитово: суммы накапливаются в том же порядке, что и в
+    GUI. Набор разделов зависит от limit_to_eight (base или base + extended),
+    поэтому задание компилируется отдельно для каждого режима.
+    """
+
+    def __init__(self, sections, penalties=(), rewards=(), limit_to_eight=True):
+        import numpy as np
+
+        self.limit_to_eight = bool(limit_to_eight)
+
+        # Разделы с одинаковым заголовком ведут себя как в GUI: побеждает последний
+        sections_by_title = {}
+        for section in sections:
+            sections_by_title[section.get("title", "")] = section
+        self.titles = list(sections_by_title)
+        self.max_scores = [
+            float(section.get("max_score", 0)) for section in sections_by_title.values()
+        ]
+        self.max_total_score = sum(self.max_scores) or 0.0
+
+        # ("radio", номер radio-раздела) или ("checkbox", срез столбцов checks)
+        self._plan = []
+        self.radio_titles = []
+        self._radio_scores = []
+        self._radio_has_subs = []
+        self._radio_sub_slices = []
+        self.checkbox_titles = []
+        self._check_scores = []
+        sub_offset = 0
+        for title, section in sections_by_title.items():
+            options = section.get("options", [])
+            if section.get("type") == "radio_with_subchecks":
+                slices = []
+                for option in options:
+                    count = len(option.get("suboptions") or [])
+                    slices.append((sub_offset, sub_offset + count))
+                    sub_offset += count
+                self._plan.append(("radio", len(self.radio_titles)))
+                self.radio_titles.append(title)
+                self._radio_scores.append(
+                    np.array([float(o.get("score", 0.0)) for o in options], dtype=np.float64)
+                )
+                self._radio_has_subs.append(
+                    np.array([bool(o.get("suboptions")) for o in options], dtype=bool)
+                )
+                self._radio_sub_slices.append(slices)
+            elif section.get("type") == "checkbox":
+                start = len(self._check_scores)
+                self._check_scores.extend(float(o.get("score", 0.0)) for o in options)
+                self._plan.append(("checkbox", (start, len(self._check_scores))))
+                self.checkbox_titles.append(title)
+            else:
+                self._plan.append(("other", None))
+        self.subcheck_count = sub_offset
+
+        self._penalty_values = [float(p.get("score", 0)) for p in penalties]
+        self._reward_values = [float(r.get("score", 0) or 0) for r in rewards]
+
+    def encode(self, selections):
+        """Переводит список словарей выбора (см. начало модуля) в SelectionMatrix."""
+        import numpy as np
+
+        n = len(selections)
+        option = np.full((n, len(self.radio_titles)), -1, dtype=np.int64)
+        subchecks = np.zeros((n, self.subcheck_count), dtype=bool)
+        checks = np.zeros((n, len(self._check_scores)), dtype=bool)
+        penalties = np.zeros((n, len(self._penalty_values)), dtype=bool)
+        rewards = np.zeros((n, len(self._reward_values)), dtype=bool)
+        delay = np.zeros(n, dtype=np.int64)
+        on_time = np.ones(n, dtype=bool)
+        double_mode = np.zeros(n, dtype=bool)
+
+        sections_by_title = dict(zip(self.titles, self._plan))
+        radio_scores = [scores.tolist() for scores in self._radio_scores]
+        for row, selection in enumerate(selections):
+            states = selection.get("sections", {})
+            for title, (kind, where) in sections_by_title.items():
+                state = states.get(title)
+                if kind == "radio":
+                    scores = radio_scores[where]
+                    if state is None:
+                        option[row, where] = scores.index(max(scores)) if scores else -1
+                        continue
+                    main_score = float(state.get("score", 0.0))
+                    option[row, where] = next(
+                        (i for i, s in enumerate(scores) if abs(s - main_score) < 1e-9), -1
+                    )
+                    slices = self._radio_sub_slices[where]
+                    # Как в compute_report: номера сравниваются на равенство, поэтому
+                    # отрицательные и слишком большие просто не совпадают ни с чем
+                    for option_index, sub_index in state.get("suboptions", []):
+                        if option_index not in range(len(slices)):
+                            continue
+                        start, stop = slices[int(option_index)]
+                        if sub_index in range(stop - start):
+                            subchecks[row, start + int(sub_index)] = True
+                elif kind == "checkbox":
+                    start, stop = where
+                    if state is None:
+                        checked = [
+                            i for i in range(stop - start) if self._check_scores[start + i] > 0
+                        ]
+                    else:
+                        checked = state.get("checked", [])
+                    for index in checked:
+                        if index in range(stop - start):
+                            checks[row, start + int(index)] = True
+            for index in selection.get("penalties", []):
+                if index in range(len(self._penalty_values)):
+                    penalties[row, int(index)] = True
+            for index in selection.get("rewards", []):
+                if index in range(len(self._reward_values)):
+                    rewards[row, int(index)] = True
+            delay[row] = parse_delay_days(selection.get("delay", 0))
+            on_time[row] = bool(selection.get("on_time", True))
+            double_mode[row] = bool(selection.get("double_mode", False))
+
+        return SelectionMatrix(
+            option, subchecks, checks, penalties, rewards, delay, on_time, double_mode
+        )
+
+    def section_scores(self, matrix):
+        """Баллы по разделам: массив N×(число разделов) в порядке self.titles."""
+        import numpy as np
+
+        n = len(matrix)
+        scores = np.zeros((n, len(self.titles)), dtype=np.float64)
+        rows = np.arange(n)
+        for column, (kind, where) in enumerate(self._plan):
+            max_score = self.max_scores[column]
+            if kind == "radio":
+                option_scores = self._radio_scores[where]
+                if not len(option_scores):
+                    continue
+                selected = matrix.option[:, where]
+                valid = selected >= 0
+                safe = np.where(valid, selected, 0)
+                main_score = option_scores[safe]
+                counts = np.stack(
+                    [
+                        matrix.subchecks[:, start:stop].sum(axis=1)
+                        for start, stop in self._radio_sub_slices[where]
+                    ],
+                    axis=1,
+                )[rows, safe]
+                deduction = np.minimum(np.abs(main_score) * counts, max_score)
+                with_subs = max_score - deduction
+                without_subs = np.where(main_score >= 0, main_score, max_score + main_score)
+                section = np.where(
+                    self._radio_has_subs[where][safe], with_subs, without_subs
+                )
+                scores[:, column] = np.where(valid, section, 0.0)
+            elif kind == "checkbox":
+                start, stop = where
+                score_sum = np.zeros(n, dtype=np.float64)
+                for index in range(start, stop):
+                    checked = matrix.checks[:, index]
+                    score_sum = np.where(checked, score_sum + self._check_scores[index], score_sum)
+                scores[:, column] = np.maximum(0.0, np.minimum(max_score, score_sum))
+        return scores
+
+    def score(self, matrix):
+        """Итоговые оценки N студентов (float64), как в compute_report."""
+        import numpy as np
+
+        n = len(matrix)
+        section_scores = self.section_scores(matrix)
+        total_score = np.zeros(n, dtype=np.float64)
+        for column in range(section_scores.shape[1]):
+            total_score = total_score + section_scores[:, column]
+
+        penalty_score = np.zeros(n, dtype=np.float64)
+        disqualified = np.zeros(n, dtype=bool)
+        for index, value in enumerate(self._penalty_values):
+            checked = matrix.penalties[:, index]
+            if value <= -1000:
+                disqualified |= checked
+            else:
+                penalty_score = np.where(checked, penalty_score + value, penalty_score)
+
+        reward_bonus = np.zeros(n, dtype=np.float64)
+        for index, value in enumerate(self._reward_values):
+            checked = matrix.rewards[:, index]
+            reward_bonus = np.where(checked, reward_bonus + value, reward_bonus)
+
+        penalty_score = np.where(disqualified, 0.0, penalty_score)
+        reward_bonus = np.where(disqualified, 0.0, reward_bonus)
+
+        max_total_score = self.max_total_score
+        if self.limit_to_eight:
+            effective_cap, _, _ = resolve_scoring_scale(max_total_score, True, False)
+            base_cap = effective_cap if effective_cap > 0 else 8.0
+            reference_max = max_total_score if max_total_score > 0 else base_cap
+            lost_points = np.maximum(0.0, reference_max - total_score)
+            adjusted_total = base_cap - lost_points + penalty_score + reward_bonus
+            final_score = np.maximum(0.0, np.minimum(base_cap, adjusted_total))
+        else:
+            effective_cap, _, _ = resolve_scoring_scale(max_total_score, False, True)
+            base_cap = effective_cap if effective_cap > 0 else 10.0
+            reference_max = max_total_score if max_total_score > 0 else base_cap
+            scaling_ratio = (base_cap / reference_max) if reference_max > 0 else 1.0
+            lost_points = np.maximum(0.0, reference_max - total_score)
+            adjusted_total = base_cap - (lost_points * scaling_ratio) + penalty_score + reward_bonus
+            double_final = np.maximum(0.0, np.minimum(base_cap, adjusted_total))
+
+            effective_cap, _, _ = resolve_scoring_scale(max_total_score, False, False)
+            base_total = total_score + penalty_score + reward_bonus
+            if effective_cap > 0:
+                plain_final = np.maximum(0.0, np.minimum(effective_cap, base_total))
+            else:
+                plain_final = np.maximum(0.0, base_total)
+            final_score = np.where(matrix.double_mode, double_final, plain_final)
+
+        effective_delay = np.where(~matrix.on_time & (matrix.delay == 0), 1, matrix.delay)
+        return np.where(effective_delay > 0, 0.0, final_score)
+
+
+def score_selections(source, selections, penalties=(), rewards=()):
+    """Итоговые оценки для списка выборов одного задания (массив NumPy).
+
+    Библиотечная точка входа для пересчёта итогов без листов (например, всей
+    ведомости после правки criteria.json); GUI и batch.py её не вызывают —
+    им всё равно нужен полный отчёт compute_report для отрисовки. Выборы
+    группируются по limit_to_eight, каждая группа считается одним проходом
+    CompiledHomework; порядок результата совпадает с входным.
+    """
+    import numpy as np
+
+    final_scores = np.zeros(len(selections), dtype=np.float64)
+    groups = {}
+    for row, selection in enumerate(selections):
+        groups.setdefault(bool(selection.get("limit_to_eight", True)), []).append(row)
+    for limit_to_eight, rows in groups.items():
+        compiled = CompiledHomework(
+            criteria_sections(source, limit_to_eight), penalties, rewards, limit_to_eight
+        )
+        matrix = compiled.encode([selections[row] for row in rows])
+        final_scores[rows] = compiled.score(matrix)
+    return final_scores
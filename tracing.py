@@ -0,0 +1,235 @@
+"""Лёгкая трассировка этапов формирования листа.
+
+По умолчанию выключена и почти ничего не стоит: span() возвращает общий
+пустой контекст, count() сразу выходит. Включается переменной окружения
+EVALUATION_TRACE (путь к файлу трассы или 1 — trace.jsonl в текущей папке)
+или ключом --trace у main.py и batch.py.
+
+Каждый завершённый этап (span) дописывается в файл строкой JSON:
+
+    {"span": "layout", "ms": 12.41, "parent": "sheet", "thread": "render-worker",
+     "ts": 1760000000.123, "counts": {"emoji_hits": 3}, ...}
+
+Вложенные этапы внутри одного потока связываются сами (стек на поток);
+чтобы продолжить этап в другом потоке, его передают в resume(). Время
+вложенных этапов (stages) и счётчики (counts) суммируются в родителя, так
+что строка корневого этапа — готовая сводка по листу; summary() делает из
+неё одну строку для строки состояния.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+TRACE_ENV = "EVALUATION_TRACE"
+DEFAULT_TRACE_FILENAME = "trace.jsonl"
+
+# Подписи этапов и счётчиков в summary(); порядок — порядок вывода
+STAGE_LABELS = {
+    "import": "импорт",
+    "scoring": "расчёт",
+    "layout": "разметка",
+    "font_load": "шрифты",
+    "emoji_decode": "эмодзи",
+    "draw": "отрисовка",
+    "encode": "кодирование",
+    "save": "сохранение",
+}
+COUNT_LABELS = {
+    "text_runs": "строк текста",
+    "template_runs": "из шаблона",
+    "emoji_hits": "эмодзи из кэша",
+    "emoji_misses": "эмодзи загружено",
+    "emoji_errors": "ошибок эмодзи",
+}
+
+_writer = None
+_writer_lock = threading.Lock()
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+
+
+class Span:
+    """Этап трассы; завершается один раз методом finish()."""
+
+    __slots__ = ("name", "fields", "parent", "started", "wall", "stages", "counts", "record")
+
+    def __init__(self, name, parent=None, fields=None):
+        self.name = name
+        self.parent = parent
+        self.fields = fields or {}
+        self.stages = {}
+        self.counts = {}
+        self.record = None
+        self.wall = time.time()
+        self.started = time.perf_counter()
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def finish(self):
+        """Записывает строку трассы и переносит время и счётчики в родителя."""
+        if self.record is not None:
+            return self.record
+        ms = (time.perf_counter() - self.started) * 1000
+        record = {
+            "span": self.name,
+            "ms": round(ms, 3),
+            "parent": self.parent.name if self.parent is not None else None,
+            "thread": threading.current_thread().name,
+            "ts": round(self.wall, 3),
+        }
+        record.update(self.fields)
+        if self.stages:
+            record["stages"] = {name: round(value, 3) for name, value in self.stages.items()}
+        if self.counts:
+            record["counts"] = dict(self.counts)
+        self.record = record
+        if self.parent is not None:
+            with _writer_lock:
+                stages = self.parent.stages
+                stages[self.name] = stages.get(self.name, 0.0) + ms
+                for name, value in self.stages.items():
+                    stages[name] = stages.get(name, 0.0) + value
+                for name, value in self.counts.items():
+                    self.parent.counts[name] = self.parent.counts.get(name, 0) + value
+        _write(record)
+        return record
+
+
+def configure(path):
+    """Включает трассировку с записью в path; None выключает."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+        if path:
+            # Строки дописываются целиком, поэтому несколько процессов пакета
+            # могут писать в один файл
+            _writer = open(path, "a", encoding="utf-8", buffering=1)
+
+
+def configure_from_env(environ=None):
+    environ = os.environ if environ is None else environ
+    value = environ.get(TRACE_ENV, "")
+    if value in ("", "0"):
+        return None
+    path = DEFAULT_TRACE_FILENAME if value == "1" else value
+    configure(path)
+    return path
+
+
+def trace_path_from_argv(argv):
+    """Путь из --trace[=путь] или None, если ключа нет."""
+    for arg in argv:
+        if arg == "--trace":
+            return DEFAULT_TRACE_FILENAME
+        if arg.startswith("--trace="):
+            return arg.split("=", 1)[1] or DEFAULT_TRACE_FILENAME
+    return None
+
+
+def enabled():
+    return _writer is not None
+
+
+def _write(record):
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+    with _writer_lock:
+        if _writer is not None:
+            _writer.write(line)
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current():
+    """Открытый этап текущего потока или None."""
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+def start(name, **fields):
+    """Корневой этап без привязки к потоку (None, если трассировка выключена).
+
+    Используется, когда этап начинается в одном потоке, а заканчивается в
+    другом: продолжить его можно через resume(), завершить — finish().
+    """
+    if _writer is None:
+        return None
+    return Span(name, current(), fields)
+
+
+@contextlib.contextmanager
+def _open_span(name, fields):
+    span = Span(name, current(), fields)
+    stack = _stack()
+    stack.append(span)
+    try:
+        yield span
+    finally:
+        stack.pop()
+        span.finish()
+
+
+def span(name, **fields):
+    """Контекст этапа: with span("layout"): ...; выдаёт Span или None."""
+    if _writer is None:
+        return _NULL
+    return _open_span(name, fields)
+
+
+@contextlib.contextmanager
+def _resumed(span):
+    stack = _stack()
+    stack.append(span)
+    try:
+        yield span
+    finally:
+        stack.pop()
+
+
+def resume(span):
+    """Делает span текущим этапом в этом потоке (без завершения)."""
+    if span is None or _writer is None:
+        return _NULL
+    return _resumed(span)
+
+
+def count(name, n=1):
+    """Прибавляет n к счётчику текущего этапа."""
+    if _writer is None:
+        return
+    span = current()
+    if span is not None:
+        span.count(name, n)
+
+
+def summary(record):
+    """Строка вида «Трассировка: 84.2 мс — разметка 20.3, ...» по записи этапа."""
+    if not record:
+        return ""
+    stages = record.get("stages", {})
+    parts = [
+        f"{label} {stages[name]:.1f}" for name, label in STAGE_LABELS.items() if name in stages
+    ]
+    text = f"Трассировка: {record['ms']:.1f} мс"
+    if parts:
+        text += " — " + ", ".join(parts)
+    counts = record.get("counts", {})
+    extra = [f"{label} {counts[name]}" for name, label in COUNT_LABELS.items() if counts.get(name)]
+    if counts.get("bytes_written"):
+        extra.append(f"записано {counts['bytes_written'] / 1024:.1f} КБ")
+    if extra:
+        text += "; " + ", ".join(extra)
+    return text
+
+
+configure_from_env()